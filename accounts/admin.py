@@ -1,38 +1,252 @@
+from contextlib import contextmanager
+from functools import reduce
 
-from django.contrib import admin
-from .models import Profile, Category, Transaction, BillDue, Calendar, CalendarCell
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Min, Max
+from django.http import QueryDict
+from django.utils.functional import cached_property
 
+from .cells import recompute_cells
+from .db_routers import DEFAULT_SHARD, shard_aliases, stale_shard, user_atomic, user_shard
+from .models import (
+    Profile, Category, Transaction, TransactionArchive, BillDue, Budget, Calendar, CalendarCell, ShardAssignment,
+    SpendingAnomaly,
+)
 
+
+# ---------- PAGINATION ----------------------------------------------------------------
+class EstimatedCountPaginator(Paginator):
+    """
+    Use PostgreSQL's planner estimate instead of COUNT(*) for unfiltered
+    changelists of big tables; filtered or small ones still count exactly.
+    """
+    exact_below = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            table = queryset.model._meta.db_table
+            with connection.cursor() as cursor:
+                # A partitioned parent has no estimate of its own; add up its partitions.
+                cursor.execute(
+                    "SELECT SUM(reltuples) FROM pg_class WHERE reltuples > 0 AND ("
+                    "oid = %s::regclass OR oid IN "
+                    "(SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass))",
+                    [table, table],
+                )
+                estimate = int(cursor.fetchone()[0] or 0)
+            if estimate >= self.exact_below:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+# ---------- SHARDS --------------------------------------------------------------------
+class ShardListFilter(admin.SimpleListFilter):
+    """Pick the shard a per-user changelist reads from; ShardedAdmin applies it."""
+    title = "shard"
+    parameter_name = "shard"
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shard_aliases() if alias != DEFAULT_SHARD]
+
+    def choices(self, changelist):
+        choices = super().choices(changelist)
+        everything = next(choices)
+        everything["display"] = DEFAULT_SHARD
+        yield everything
+        yield from choices
+
+    def queryset(self, request, queryset):
+        return queryset
+
+
+class ShardedAdmin(LargeTableAdmin):
+    """
+    Admin for a per-user model, showing one shard at a time. Users live on
+    'default', so on other shards user joins are dropped from select_related
+    and username search resolves ids on 'default' first.
+    """
+    shard_user_field = "user"
+
+    def get_shard(self, request):
+        shard = request.GET.get("shard") or QueryDict(request.GET.get("_changelist_filters", "")).get("shard")
+        return shard if shard in shard_aliases() else DEFAULT_SHARD
+
+    def get_list_filter(self, request):
+        filters = super().get_list_filter(request)
+        return (*filters, ShardListFilter) if len(shard_aliases()) > 1 else filters
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(self.get_shard(request))
+
+    def get_list_select_related(self, request):
+        related = super().get_list_select_related(request)
+        if self.get_shard(request) == DEFAULT_SHARD:
+            return related
+        paths = (path.removesuffix("user").rstrip("_") for path in related)
+        return tuple(dict.fromkeys(path for path in paths if path))
+
+    def get_search_results(self, request, queryset, search_term):
+        if self.get_shard(request) == DEFAULT_SHARD or not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        user_ids = User.objects.using(DEFAULT_SHARD).filter(username=search_term.strip())
+        return queryset.filter(**{f"{self.shard_user_field}_id__in": list(user_ids.values_list("pk", flat=True))}), False
+
+    def get_owner_id(self, obj):
+        *path, field = self.shard_user_field.split("__")
+        return getattr(reduce(getattr, path, obj), f"{field}_id")
+
+    @contextmanager
+    def owner_atomic(self, user_id, db=None):
+        """
+        user_atomic() for an admin write: it takes the ShardAssignment lock like
+        every other write, so it cannot race move_user onto a shard whose copy is
+        about to be dropped. Rows read from a shard the user has left are refused.
+        """
+        with user_atomic(user_id) as shard:
+            if stale_shard(db, shard):
+                raise PermissionDenied(f"User {user_id} has moved to {shard}; reload the page.")
+            yield
+
+    def save_model(self, request, obj, form, change):
+        with self.owner_atomic(self.get_owner_id(obj), obj._state.db if change else None):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with self.owner_atomic(self.get_owner_id(obj), obj._state.db):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        user_field = f"{self.shard_user_field}_id"
+        for user_id in set(queryset.values_list(user_field, flat=True)):
+            with self.owner_atomic(user_id, queryset.db):
+                queryset.filter(**{user_field: user_id}).delete()
+
+
+# ---------- ACTIONS -------------------------------------------------------------------
+# (user column, date column) of the models the action is offered on.
+CELL_SPANS = {
+    Calendar: ('user_id', 'cells__date'),
+    CalendarCell: ('calendar__user_id', 'date'),
+}
+
+
+@admin.action(description="Recompute calendar cells for the selected days")
+def recompute_selected_cells(modeladmin, request, queryset):
+    """One grouped query for the span per user, then one set-based recompute per user."""
+    user_field, date_field = CELL_SPANS[queryset.model]
+    spans = (
+        queryset.order_by()
+        .values(user_field)
+        .annotate(start=Min(date_field), end=Max(date_field))
+        .filter(start__isnull=False)
+    )
+    for span in spans:
+        with user_shard(span[user_field]):
+            recompute_cells(span[user_field], span['start'], span['end'])
+    modeladmin.message_user(request, f"Recomputed cells for {len(spans)} user(s).", messages.SUCCESS)
+
+
+# ---------- MODELS --------------------------------------------------------------------
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
     list_display = ("id", "user", "created_at")
-    search_fields = ("user__username", "user__email")
+    list_select_related = ("user",)
+    search_fields = ("=user__username", "=user__email")
+    raw_id_fields = ("user",)
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(ShardedAdmin):
     list_display = ("id", "name", "user")
-    search_fields = ("name", "user__username")
+    list_select_related = ("user",)
+    search_fields = ("=user__username", "name")
+    raw_id_fields = ("user",)
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ShardedAdmin):
     list_display = ("id", "user", "category", "amount", "type", "date")
-    list_filter = ("type", "date")
-    search_fields = ("user__username", "category__name")
+    list_filter = ("type",)
+    list_select_related = ("user", "category__user")
+    date_hierarchy = "date"
+    search_fields = ("=user__username",)
+    raw_id_fields = ("user", "category")
+
+
+@admin.register(TransactionArchive)
+class TransactionArchiveAdmin(ShardedAdmin):
+    list_display = ("id", "user", "year", "row_count", "updated_at")
+    list_select_related = ("user",)
+    exclude = ("data",)
+    readonly_fields = ("user", "year", "monthly_totals", "row_count")
 
 
 @admin.register(BillDue)
-class BillDueAdmin(admin.ModelAdmin):
+class BillDueAdmin(ShardedAdmin):
     list_display = ("id", "user", "name", "amount", "due_date", "is_paid")
-    list_filter = ("due_date", "is_paid")
+    list_filter = ("is_paid",)
+    list_select_related = ("user",)
+    date_hierarchy = "due_date"
+    search_fields = ("=user__username",)
+    raw_id_fields = ("user",)
+
+
+@admin.register(Budget)
+class BudgetAdmin(ShardedAdmin):
+    list_display = ("id", "user", "category", "period", "limit")
+    list_filter = ("period",)
+    list_select_related = ("user", "category")
+    search_fields = ("=user__username",)
+    raw_id_fields = ("user", "category")
+
+
+@admin.register(SpendingAnomaly)
+class SpendingAnomalyAdmin(ShardedAdmin):
+    list_display = ("id", "user", "kind", "category", "date", "amount", "baseline", "score")
+    list_filter = ("kind",)
+    list_select_related = ("user", "category")
+    date_hierarchy = "date"
+    search_fields = ("=user__username",)
+    raw_id_fields = ("user", "category")
 
 
 @admin.register(Calendar)
-class CalendarAdmin(admin.ModelAdmin):
+class CalendarAdmin(ShardedAdmin):
     list_display = ("id", "user", "month", "year")
+    list_select_related = ("user",)
+    search_fields = ("=user__username",)
+    raw_id_fields = ("user",)
+    actions = [recompute_selected_cells]
 
 
 @admin.register(CalendarCell)
-class CalendarCellAdmin(admin.ModelAdmin):
-    list_display = ("id", "calendar", "date", "total_expenses")
\ No newline at end of file
+class CalendarCellAdmin(ShardedAdmin):
+    shard_user_field = "calendar__user"
+    list_display = ("id", "calendar", "date", "total_expenses")
+    list_select_related = ("calendar__user",)
+    date_hierarchy = "date"
+    search_fields = ("=calendar__user__username",)
+    raw_id_fields = ("calendar",)
+    actions = [recompute_selected_cells]
+
+
+@admin.register(ShardAssignment)
+class ShardAssignmentAdmin(admin.ModelAdmin):
+    list_display = ("user", "shard", "moved_at")
+    list_filter = ("shard",)
+    list_select_related = ("user",)
+    search_fields = ("=user__username",)
+    raw_id_fields = ("user",)
+    readonly_fields = ("shard", "moved_at")
@@ -0,0 +1,189 @@
+"""
+Batch spending anomaly detection.
+
+``detect_range`` handles a block of user ids on one shard. It reads the
+block's expenses and bills with two ``values_list`` queries, does every
+comparison as a NumPy array operation over all the block's users at once,
+and replaces the block's recent SpendingAnomaly rows. ``detect_anomalies``
+spreads the blocks over a process pool.
+
+Three kinds of finding:
+
+- spike: a (user, category) month whose spend is more than SPIKE_Z standard
+  deviations and SPIKE_RATIO times above the mean of the BASELINE_MONTHS
+  months before it.
+- large_transaction: an expense more than LARGE_Z standard deviations and
+  LARGE_RATIO times above the mean expense of its (user, category) in the
+  window. At least MIN_HISTORY expenses are needed to judge.
+- late_bill: a bill paid at least LATE_DAYS after its due date, or still
+  unpaid that long after it.
+
+Only the last REPORT_MONTHS months are reported. Older months only feed the
+baselines.
+"""
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import BigIntegerField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from accounts.db_routers import using_shard
+from accounts.fields import CENTS
+from accounts.models import BillDue, SpendingAnomaly, Transaction
+
+
+BASELINE_MONTHS = 6
+REPORT_MONTHS = 3
+SPIKE_Z = 3.0
+SPIKE_RATIO = 2.0
+MIN_SPIKE_CENTS = 5000
+LARGE_Z = 3.0
+LARGE_RATIO = 3.0
+MIN_HISTORY = 5
+LATE_DAYS = 1
+
+
+def _money(cents):
+    return (Decimal(round(float(cents))) / 100).quantize(CENTS)
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _days(values):
+    """datetime64[D] array of dates (NaT for None)."""
+    return np.array(values, dtype='datetime64[D]')
+
+
+# ---------- SPENDING ------------------------------------------------------------------
+def _spending_findings(users, categories, days, cents, report_from, today):
+    """Spikes and large transactions among one block's expenses (parallel arrays)."""
+    if not len(cents):
+        return [], []
+    months = days.astype('datetime64[M]').astype(np.int64) + 1970 * 12
+    first, last = _month_index(today) - REPORT_MONTHS - BASELINE_MONTHS + 1, _month_index(today)
+    keys, key_of = np.unique(np.stack([users, categories], axis=1), axis=0, return_inverse=True)
+    key_of = key_of.ravel()
+
+    # Dense (key x month) spend; column j of the running sums covers months before j.
+    grid = np.zeros((len(keys), last - first + 1), dtype=np.int64)
+    np.add.at(grid, (key_of, months - first), cents)
+    total = np.zeros((len(keys), grid.shape[1] + 1))
+    total[:, 1:] = np.cumsum(grid, axis=1)
+    squares = np.zeros_like(total)
+    squares[:, 1:] = np.cumsum(grid.astype(float) ** 2, axis=1)
+
+    spikes = []
+    for column in range(BASELINE_MONTHS, grid.shape[1]):
+        if first + column < report_from:
+            continue
+        mean = (total[:, column] - total[:, column - BASELINE_MONTHS]) / BASELINE_MONTHS
+        mean_sq = (squares[:, column] - squares[:, column - BASELINE_MONTHS]) / BASELINE_MONTHS
+        std = np.sqrt(np.maximum(mean_sq - mean ** 2, 0))
+        spend = grid[:, column]
+        score = (spend - mean) / np.maximum(std, 1)
+        flagged = np.nonzero(
+            (spend >= MIN_SPIKE_CENTS) & (score > SPIKE_Z) & (spend > SPIKE_RATIO * mean)
+        )[0]
+        spikes += [
+            (keys[k, 0], keys[k, 1], _month_start(first + column), spend[k], mean[k], score[k])
+            for k in flagged
+        ]
+
+    # Per-key mean/std of single expenses over the whole window.
+    count = np.bincount(key_of, minlength=len(keys))
+    mean = np.bincount(key_of, weights=cents, minlength=len(keys)) / count
+    mean_sq = np.bincount(key_of, weights=cents.astype(float) ** 2, minlength=len(keys)) / count
+    std = np.sqrt(np.maximum(mean_sq - mean ** 2, 0))[key_of]
+    mean = mean[key_of]
+    score = (cents - mean) / np.maximum(std, 1)
+    flagged = np.nonzero(
+        (months >= report_from) & (count[key_of] >= MIN_HISTORY)
+        & (score > LARGE_Z) & (cents > LARGE_RATIO * mean)
+    )[0]
+    large = [(users[i], categories[i], i, cents[i], mean[i], score[i]) for i in flagged]
+    return spikes, large
+
+
+# ---------- BILLS ---------------------------------------------------------------------
+def _late_bills(due, paid, unpaid, today):
+    """Indexes of late bills and how many days late each is."""
+    settled = np.where(unpaid, _days([today])[0], paid)
+    late = (settled - due).astype('timedelta64[D]').astype(np.int64)
+    late = np.where(np.isnat(settled), 0, late)
+    flagged = np.nonzero(late >= LATE_DAYS)[0]
+    return flagged, late[flagged]
+
+
+# ---------- RUN -----------------------------------------------------------------------
+def detect_range(shard, first_id, last_id, today=None):
+    """Recompute anomalies for users ``first_id..last_id`` on ``shard``; returns counts by kind."""
+    today = today or date.today()
+    report_from = _month_index(today) - REPORT_MONTHS + 1
+    window_start = _month_start(report_from - BASELINE_MONTHS)
+    report_start = _month_start(report_from)
+
+    with using_shard(shard):
+        expenses = list(
+            Transaction.objects
+            .filter(user_id__gte=first_id, user_id__lte=last_id, type='expense',
+                    date__gte=window_start, date__lte=today)
+            .values_list('id', 'user_id', Coalesce('category_id', Value(0)), 'date',
+                         Cast('amount', BigIntegerField()))
+        )
+        bills = list(
+            BillDue.objects
+            .filter(user_id__gte=first_id, user_id__lte=last_id, due_date__gte=report_start, due_date__lt=today)
+            .values_list('id', 'user_id', 'due_date', 'paid_on', 'is_paid', Cast('amount', BigIntegerField()))
+        )
+
+        found = []
+        if expenses:
+            ids, users, categories, days, cents = (np.array(column) for column in zip(*expenses))
+            spikes, large = _spending_findings(
+                users.astype(np.int64), categories.astype(np.int64), _days(days), cents.astype(np.int64),
+                report_from, today,
+            )
+            found += [
+                SpendingAnomaly(
+                    user_id=int(user), category_id=int(category) or None, kind='spike', date=month,
+                    amount=_money(spend), baseline=_money(mean), score=float(score),
+                )
+                for user, category, month, spend, mean, score in spikes
+            ]
+            found += [
+                SpendingAnomaly(
+                    user_id=int(user), category_id=int(category) or None, kind='large_transaction',
+                    date=days[i], object_id=int(ids[i]), amount=_money(amount),
+                    baseline=_money(mean), score=float(score),
+                )
+                for user, category, i, amount, mean, score in large
+            ]
+        if bills:
+            bill_ids, bill_users, due, paid, is_paid, bill_cents = zip(*bills)
+            flagged, late = _late_bills(_days(due), _days(paid), ~np.array(is_paid), today)
+            found += [
+                SpendingAnomaly(
+                    user_id=bill_users[i], kind='late_bill', date=due[i], object_id=bill_ids[i],
+                    amount=_money(bill_cents[i]), score=float(days_late),
+                )
+                for i, days_late in zip(flagged, late)
+            ]
+
+        with transaction.atomic(using=shard):
+            SpendingAnomaly.objects.filter(
+                user_id__gte=first_id, user_id__lte=last_id, date__gte=report_start
+            ).delete()
+            SpendingAnomaly.objects.bulk_create(found, batch_size=1000)
+
+    counts = {kind: 0 for kind, _ in SpendingAnomaly.KIND_CHOICES}
+    for anomaly in found:
+        counts[anomaly.kind] += 1
+    return counts
@@ -0,0 +1,35 @@
+from datetime import date
+
+from rest_framework import generics, permissions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
+
+from accounts.models import SpendingAnomaly
+from .serializers import SpendingAnomalySerializer
+
+
+class SpendingAnomalyListView(generics.ListAPIView):
+    """
+    Findings of the nightly ``detect_anomalies`` run, newest first. Filter with
+    ``?kind=spike|large_transaction|late_bill`` and ``?since=YYYY-MM-DD``.
+    """
+    serializer_class = SpendingAnomalySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get_queryset(self):
+        qs = (
+            SpendingAnomaly.objects.filter(user=self.request.user)
+            .select_related("category")
+            .order_by("-date", "-score")
+        )
+        kind = self.request.query_params.get("kind")
+        if kind:
+            qs = qs.filter(kind=kind)
+        since = self.request.query_params.get("since")
+        if since:
+            try:
+                qs = qs.filter(date__gte=date.fromisoformat(since))
+            except ValueError:
+                raise ValidationError({"since": ["Use YYYY-MM-DD."]})
+        return qs
@@ -0,0 +1,73 @@
+from datetime import date
+
+from rest_framework import generics, permissions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from accounts.budgets import attach_status
+from accounts.db_routers import stale_shard, user_atomic
+from accounts.models import Budget, BudgetEvent
+from .serializers import BudgetSerializer, BudgetEventSerializer
+
+
+# ---- Budget ------------------------------------------------------------------------------
+class BudgetListCreateView(generics.ListCreateAPIView):
+    """
+    Budgets with spent, remaining and pace for the period containing ``?date=``
+    (default today). Spend comes from the running per-category counters, so the
+    page costs two queries however many transactions the period holds.
+    """
+    serializer_class = BudgetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user).select_related("category").order_by("category__name")
+
+    def list(self, request, *args, **kwargs):
+        try:
+            day = date.fromisoformat(request.query_params["date"]) if "date" in request.query_params else None
+        except ValueError:
+            return Response({"error": "Invalid date. Use YYYY-MM-DD."}, status=400)
+        budgets = attach_status(list(self.get_queryset()), day)
+        return Response(self.get_serializer(budgets, many=True).data)
+
+    def perform_create(self, serializer):
+        with user_atomic(self.request.user.id):
+            serializer.save(user=self.request.user)
+
+
+class BudgetDetailView(generics.RetrieveUpdateDestroyAPIView):
+    serializer_class = BudgetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user)
+
+    def perform_update(self, serializer):
+        with user_atomic(self.request.user.id) as shard:
+            if stale_shard(serializer.instance._state.db, shard):
+                raise NotFound()
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with user_atomic(self.request.user.id) as shard:
+            if stale_shard(instance._state.db, shard):
+                raise NotFound()
+            instance.delete()
+
+
+class BudgetEventListView(generics.ListAPIView):
+    """Thresholds the user's budgets have reached, newest first."""
+    serializer_class = BudgetEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get_queryset(self):
+        return (
+            BudgetEvent.objects.filter(budget__user=self.request.user)
+            .select_related("budget")
+            .order_by("-created_at")[:100]
+        )
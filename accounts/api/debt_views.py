@@ -0,0 +1,32 @@
+from datetime import date
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from accounts.debts import simulate
+from .serializers import DebtSimulationSerializer
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def debt_simulator(request):
+    """
+    Avalanche vs. snowball payoff of ``debts`` on ``monthly_budget`` a month,
+    starting the month of ``start`` (default next month). Nothing is stored.
+    """
+    serializer = DebtSimulationSerializer(data=request.data, context={"request": request})
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    if "start" in data:
+        start = data["start"].replace(day=1)
+    else:
+        today = date.today()
+        start = date(today.year + today.month // 12, today.month % 12 + 1, 1)
+    try:
+        result = simulate(data["debts"], data["monthly_budget"], start, data["months"])
+    except ValueError as exc:
+        return Response({"monthly_budget": [str(exc)]}, status=400)
+    return Response(result)
@@ -0,0 +1,15 @@
+from .serializers import sparse_queryset
+
+
+class SparseFieldsViewMixin:
+    """
+    For reads, narrow the queryset to what the (possibly ``?fields=``/``?expand=``
+    trimmed) serializer renders: nested relations are joined or prefetched and
+    sparse requests only select the needed columns.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in ("GET", "HEAD"):
+            return queryset
+        return sparse_queryset(queryset, self.get_serializer())
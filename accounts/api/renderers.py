@@ -0,0 +1,10 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class CompactCalendarRenderer(JSONRenderer):
+    """
+    Day-grid calendar layout, picked with ``?format=compact`` or
+    ``Accept: application/vnd.pennypal.calendar-compact+json``.
+    """
+    media_type = 'application/vnd.pennypal.calendar-compact+json'
+    format = 'compact'
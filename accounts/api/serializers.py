@@ -1,8 +1,108 @@
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from rest_framework.validators import UniqueValidator
 from django.contrib.auth.password_validation import validate_password
-from accounts.models import Profile, Category, Transaction, Calendar, CalendarCell, BillDue
+from django.db.models import F
+from accounts.models import Profile, Category, Transaction, Calendar, CalendarCell, BillDue, Budget, BudgetEvent, SpendingAnomaly
+from accounts.budgets import attach_status
+from accounts.categories import attach_usage
+from accounts.debts import MAX_MONTHS
+from accounts.fields import MoneyField, cents_json, in_cents
+
+
+# ---------- BASE ----------
+class MoneyModelSerializer(serializers.ModelSerializer):
+    """Serializes MoneyField (integer cents in the DB) as the usual 2-place decimal string."""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        MoneyField: serializers.DecimalField,
+    }
+
+
+def _query_list(request, name):
+    """Comma-separated query parameter as a set, or None when absent or not a read."""
+    if request is None or request.method not in ("GET", "HEAD"):
+        return None
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return {part.strip() for part in value.split(",") if part.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=a,b`` keeps only those fields; ``?expand=x`` nests a relation from
+    Meta.expandable_fields. Without either parameter the output is unchanged.
+    With one, relations that are not expanded collapse to their primary key
+    (single) or are left out (many); ``x.y`` expands a nested serializer's own
+    relation.
+    """
+    sparse = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        fields = _query_list(request, "fields")
+        expand = _query_list(request, "expand")
+        if fields is None and expand is None:
+            return
+        self.sparse = True
+        _trim_fields(self, fields, expand or set())
+
+
+def _trim_fields(serializer, fields, expand):
+    for name in list(serializer.fields):
+        if fields is not None and name not in fields:
+            serializer.fields.pop(name)
+    for name in getattr(serializer.Meta, "expandable_fields", ()):
+        field = serializer.fields.get(name)
+        if field is None:
+            continue
+        single = not isinstance(field, serializers.ListSerializer)
+        if name not in expand and not any(e.startswith(f"{name}.") for e in expand):
+            if single and isinstance(field, serializers.BaseSerializer):
+                source = {} if field.source == name else {"source": field.source}
+                serializer.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **source)
+            else:
+                serializer.fields.pop(name)
+            continue
+        nested = field if single else field.child
+        if isinstance(nested, serializers.BaseSerializer):
+            prefix = f"{name}."
+            _trim_fields(nested, None, {e[len(prefix):] for e in expand if e.startswith(prefix)})
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Narrow ``queryset`` to what ``serializer`` will render: join or prefetch
+    the nested relations and, for sparse requests, ``.only()`` the columns.
+    """
+    columns = {f.name for f in queryset.model._meta.concrete_fields}
+    selected, joins, prefetches = set(), [], []
+    narrow = serializer.sparse
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            prefetches.append(field.source)
+        elif isinstance(field, serializers.BaseSerializer):
+            joins.append(field.source)
+            selected.add(field.source)
+        elif field.source in columns:
+            selected.add(field.source)
+        else:
+            narrow = False  # method or computed field; it may read any column
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if narrow:
+        queryset = queryset.only(queryset.model._meta.pk.name, *selected)
+    return queryset
 
 
 # ---------- USER (used for /profile/, /profile/update/, etc.) ----------
@@ -76,19 +176,61 @@ class LoginSerializer(serializers.Serializer):
 
 
 # ---------- CATEGORY ----------
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ["id", "name", "user"]
         read_only_fields = ["user"]
 
 
+class CategoryUsageSerializer(CategorySerializer):
+    """A category plus its usage (see accounts.categories.annotate_usage)."""
+    MONEY = {"max_digits": 12, "decimal_places": 2, "read_only": True}
+
+    transaction_count = serializers.IntegerField(read_only=True)
+    income_total = serializers.DecimalField(**MONEY)
+    expense_total = serializers.DecimalField(**MONEY)
+    last_used = serializers.DateField(read_only=True)
+
+    class Meta(CategorySerializer.Meta):
+        fields = [*CategorySerializer.Meta.fields, "transaction_count", "income_total", "expense_total", "last_used"]
+
+    def to_representation(self, instance):
+        if not hasattr(instance, "transaction_count"):
+            attach_usage([instance])
+        return super().to_representation(instance)
+
+
+class CategoryBulkSerializer(serializers.Serializer):
+    """Input of the category merge and bulk-delete endpoints."""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+    def validate_ids(self, ids):
+        ids = set(ids)
+        owned = set(
+            Category.objects.filter(user=self.context["request"].user, pk__in=ids).values_list("pk", flat=True)
+        )
+        if owned != ids:
+            raise serializers.ValidationError(f"Unknown categories: {sorted(ids - owned)}.")
+        return ids
+
+
+class CategoryMergeSerializer(CategoryBulkSerializer):
+    into = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
+
+    def validate_into(self, category):
+        if category.user_id != self.context["request"].user.id:
+            raise serializers.ValidationError("Category not found.")
+        return category
+
+
 # ---------- TRANSACTION ----------
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(SparseFieldsMixin, MoneyModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source="category", write_only=True
     )
+    idempotency_key = serializers.CharField(write_only=True, required=False, max_length=64)
 
     class Meta:
         model = Transaction
@@ -101,8 +243,10 @@ class TransactionSerializer(serializers.ModelSerializer):
             "date",
             "category",
             "category_id",
+            "idempotency_key",
         ]
         read_only_fields = ["user"]
+        expandable_fields = ["category"]
 
     def create(self, validated_data):
         """Assign user automatically"""
@@ -113,31 +257,209 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 
 # ---------- BILL DUE ----------
-class BillDueSerializer(serializers.ModelSerializer):
+class BillDueSerializer(SparseFieldsMixin, MoneyModelSerializer):
     class Meta:
         model = BillDue
-        fields = ["id", "name", "amount", "type", "due_date", "note", "is_paid"]
+        fields = ["id", "name", "amount", "type", "due_date", "note", "is_paid", "paid_on"]
+        read_only_fields = ["paid_on"]
+
+
+# ---------- BUDGET ----------
+class BudgetSerializer(MoneyModelSerializer):
+    """A budget plus its spend in the current period (see accounts.budgets.budget_status)."""
+    MONEY = {"max_digits": 12, "decimal_places": 2, "read_only": True}
+
+    period_start = serializers.DateField(source="status.period_start", read_only=True)
+    period_end = serializers.DateField(source="status.period_end", read_only=True)
+    spent = serializers.DecimalField(source="status.spent", **MONEY)
+    remaining = serializers.DecimalField(source="status.remaining", **MONEY)
+    projected = serializers.DecimalField(source="status.projected", **MONEY)
+    percent_used = serializers.FloatField(source="status.percent_used", read_only=True)
+    period_elapsed = serializers.FloatField(source="status.period_elapsed", read_only=True)
+    pace = serializers.FloatField(source="status.pace", read_only=True)
+
+    class Meta:
+        model = Budget
+        fields = [
+            "id", "category", "period", "limit",
+            "period_start", "period_end", "spent", "remaining", "projected",
+            "percent_used", "period_elapsed", "pace",
+        ]
+
+    def validate_category(self, category):
+        request = self.context.get("request")
+        if request is not None and category.user_id != request.user.id:
+            raise serializers.ValidationError("Category not found.")
+        return category
+
+    def validate_limit(self, limit):
+        if limit <= 0:
+            raise serializers.ValidationError("Limit must be greater than zero.")
+        return limit
+
+    def to_representation(self, instance):
+        if not hasattr(instance, "status"):
+            attach_status([instance])
+        return super().to_representation(instance)
+
+
+class BudgetEventSerializer(MoneyModelSerializer):
+    category = serializers.IntegerField(source="budget.category_id", read_only=True)
+
+    class Meta:
+        model = BudgetEvent
+        fields = ["id", "budget", "category", "period_start", "threshold", "spent", "created_at"]
+
+
+# ---------- DEBT SIMULATOR ----------
+class DebtSerializer(serializers.Serializer):
+    """One debt; ``bill`` fills in name and balance from a Credit Card bill."""
+    MONEY = {"max_digits": 12, "decimal_places": 2}
+
+    bill = serializers.PrimaryKeyRelatedField(queryset=BillDue.objects.filter(type="Credit Card"), required=False)
+    name = serializers.CharField(max_length=100, required=False)
+    balance = serializers.DecimalField(min_value=0, required=False, **MONEY)
+    apr = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100)
+    minimum_payment = serializers.DecimalField(min_value=0, required=False, **MONEY)
+
+    def validate_bill(self, bill):
+        request = self.context.get("request")
+        if request is not None and bill.user_id != request.user.id:
+            raise serializers.ValidationError("Bill not found.")
+        return bill
+
+    def validate(self, attrs):
+        bill = attrs.pop("bill", None)
+        if bill is not None:
+            attrs.setdefault("name", bill.name)
+            attrs.setdefault("balance", bill.amount)
+        if "balance" not in attrs:
+            raise serializers.ValidationError({"balance": ["Give a balance or a Credit Card bill."]})
+        attrs.setdefault("name", "")
+        return attrs
+
+
+class DebtSimulationSerializer(serializers.Serializer):
+    debts = DebtSerializer(many=True, allow_empty=False, max_length=50)
+    monthly_budget = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal("0.01"))
+    months = serializers.IntegerField(min_value=1, max_value=MAX_MONTHS * 2, default=MAX_MONTHS)
+    start = serializers.DateField(required=False)
+
+
+# ---------- ANOMALY ----------
+class SpendingAnomalySerializer(MoneyModelSerializer):
+    category_name = serializers.CharField(source="category.name", read_only=True, default=None)
+
+    class Meta:
+        model = SpendingAnomaly
+        fields = [
+            "id", "kind", "category", "category_name", "date", "object_id",
+            "amount", "baseline", "score", "detected_at",
+        ]
 
 
 # ---------- CALENDAR CELL ----------
-class CalendarCellSerializer(serializers.ModelSerializer):
+class BillsByDate(dict):
+    """A user's serialized bills due in [start, end] keyed by due date, read in one query on first lookup."""
+
+    def __init__(self, user_id, start, end):
+        super().__init__()
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.loaded = False
+
+    def get(self, day, default=None):
+        if not self.loaded:
+            for bill in BillDue.objects.filter(user_id=self.user_id, due_date__range=(self.start, self.end)):
+                self.setdefault(bill.due_date, []).append(BillDueSerializer(bill).data)
+            self.loaded = True
+        return super().get(day, default)
+
+
+class CalendarCellSerializer(MoneyModelSerializer):
     bills = serializers.SerializerMethodField()
 
     class Meta:
         model = CalendarCell
         fields = ["id", "date", "total_income", "total_expenses", "net_balance", "bills"]
+        expandable_fields = ["bills"]
 
     def get_bills(self, obj):
+        bills_by_date = self.context.get("bills_by_date")
+        if bills_by_date is not None:
+            return bills_by_date.get(obj.date, [])
         bills = BillDue.objects.filter(
-            user=obj.calendar.user, due_date=obj.date
+            user_id=obj.calendar.user_id, due_date=obj.date
         )
         return BillDueSerializer(bills, many=True).data
 
 
 # ---------- CALENDAR ----------
-class CalendarSerializer(serializers.ModelSerializer):
+class CalendarSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     cells = CalendarCellSerializer(many=True, read_only=True)
 
     class Meta:
         model = Calendar
-        fields = ["id", "month", "year", "cells"]
\ No newline at end of file
+        fields = ["id", "month", "year", "cells"]
+        expandable_fields = ["cells"]
+
+# ---------- CALENDAR (compact day grid) ----------
+COMPACT_BILL_FIELDS = ["id", "name", "amount", "type", "note", "is_paid"]
+
+
+def compact_calendars(calendars):
+    """
+    Compact representation of a user's calendars, read in two queries.
+
+    Each month carries parallel ``income`` / ``expenses`` / ``net`` arrays indexed
+    by day of month minus one, and ``bills`` as ``[day_index, bill_index]`` pairs
+    into a shared table whose columns are listed once in ``bill_fields``.
+    """
+    calendars = list(calendars)
+    if not calendars:
+        return {"bill_fields": COMPACT_BILL_FIELDS, "bills": [], "calendars": []}
+
+    grids = {}
+    for calendar in calendars:
+        _, num_days = monthrange(calendar.year, calendar.month)
+        grids[(calendar.year, calendar.month)] = {
+            "id": calendar.id,
+            "month": calendar.month,
+            "year": calendar.year,
+            "income": [0] * num_days,
+            "expenses": [0] * num_days,
+            "net": [0] * num_days,
+            "bills": [],
+        }
+
+    cells = CalendarCell.objects.filter(
+        calendar_id__in=[c.id for c in calendars]
+    ).values_list("date", *(in_cents(F(name)) for name in ("total_income", "total_expenses", "net_balance")))
+    for day, income, expenses, net in cells:
+        grid = grids[(day.year, day.month)]
+        grid["income"][day.day - 1] = cents_json(income)
+        grid["expenses"][day.day - 1] = cents_json(expenses)
+        grid["net"][day.day - 1] = cents_json(net)
+
+    first = min(grids)
+    last = max(grids)
+    bills = BillDue.objects.filter(
+        user_id=calendars[0].user_id,
+        due_date__gte=date(first[0], first[1], 1),
+        due_date__lte=date(last[0], last[1], monthrange(*last)[1]),
+    ).order_by("due_date", "id").values_list("due_date", *COMPACT_BILL_FIELDS)
+
+    bill_table = []
+    for due_date, *row in bills:
+        grid = grids.get((due_date.year, due_date.month))
+        if grid is None:
+            continue
+        grid["bills"].append([due_date.day - 1, len(bill_table)])
+        bill_table.append(row)
+
+    return {
+        "bill_fields": COMPACT_BILL_FIELDS,
+        "bills": bill_table,
+        "calendars": [grids[(c.year, c.month)] for c in calendars],
+    }
@@ -0,0 +1,58 @@
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from accounts.models import Profile, Category, Transaction, BillDue, Tombstone
+from .serializers import TransactionSerializer, BillDueSerializer, CategorySerializer
+
+
+# -------------------- DELTA SYNC --------------------
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def sync(request):
+    """
+    Rows created, updated or deleted since the change token ``since``.
+
+    Omit ``since`` for a full snapshot. Every response carries the ``token`` to
+    send next time; a client that is already current costs a single lookup.
+    """
+    user = request.user
+    token = Profile.objects.filter(user=user).values_list('change_seq', flat=True).first() or 0
+
+    since = request.query_params.get('since')
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return Response({"error": "Invalid change token"}, status=400)
+
+    payload = {
+        "token": str(token),
+        "transactions": [],
+        "bills": [],
+        "categories": [],
+        "deleted": {"transaction": [], "billdue": [], "category": []},
+    }
+    if since is not None and since >= token:
+        return Response(payload)
+
+    def changed(queryset):
+        queryset = queryset.filter(user=user, change_seq__lte=token)
+        if since is not None:
+            queryset = queryset.filter(change_seq__gt=since)
+        return queryset
+
+    payload["transactions"] = TransactionSerializer(
+        changed(Transaction.objects.select_related('category')), many=True
+    ).data
+    payload["bills"] = BillDueSerializer(changed(BillDue.objects.all()), many=True).data
+    payload["categories"] = CategorySerializer(changed(Category.objects.all()), many=True).data
+
+    if since is not None:
+        tombstones = Tombstone.objects.filter(
+            user=user, change_seq__gt=since, change_seq__lte=token
+        ).values_list('model', 'object_id')
+        for model, object_id in tombstones:
+            payload["deleted"].setdefault(model, []).append(object_id)
+
+    return Response(payload)
@@ -1,8 +1,14 @@
 
-from rest_framework import generics, permissions
+from django.db.models import Q
+from rest_framework import generics, permissions, status
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .mixins import SparseFieldsViewMixin
 from .serializers import TransactionSerializer, CategorySerializer
-from accounts.models import Transaction, Category
+from accounts import budgets, jobs
+from accounts.db_routers import user_atomic
+from accounts.models import Transaction, Category, Profile, next_change_seq
 
 # ---- Category ----------------------------------------------------------------------------
 class CategoryListCreateView(generics.ListCreateAPIView):
@@ -18,7 +24,14 @@ class CategoryListCreateView(generics.ListCreateAPIView):
 
 
 # ---- Transaction --------------------------------------------------------------------------
-class TransactionListCreateView(generics.ListCreateAPIView):
+class TransactionListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
+    """
+    POST one transaction or a list of them. A transaction whose idempotency key
+    (``Idempotency-Key`` header for single creates, ``idempotency_key`` per item)
+    was already used, or with ``?dedupe=true`` whose fingerprint matches an
+    existing row, is not created again; the existing row is returned instead.
+    Lists come back in request order; the status is 201 if anything was created.
+    """
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [TokenAuthentication]
@@ -26,14 +39,78 @@ class TransactionListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    def create(self, request, *args, **kwargs):
+        many = isinstance(request.data, list)
+        serializer = self.get_serializer(data=request.data, many=many)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data if many else [serializer.validated_data]
+        key = request.headers.get("Idempotency-Key")
+        if not many and key:
+            if len(key) > 64:
+                raise ValidationError({"Idempotency-Key": ["Ensure this header has no more than 64 characters."]})
+            items[0]["idempotency_key"] = key
+        dedupe = request.query_params.get("dedupe", "").lower() == "true"
+
+        with user_atomic(request.user.id):
+            # The Profile row lock serializes this user's creates, so a retry
+            # racing its original still finds it.
+            Profile.objects.select_for_update().filter(user=request.user).first()
+            results, created = self.create_missing(items, dedupe)
+
+        data = self.get_serializer(results, many=True).data
+        code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        return Response(data if many else data[0], status=code)
+
+    def create_missing(self, items, dedupe):
+        """Create the items not matched by key or fingerprint with one lookup query."""
+        user = self.request.user
+        rows = []
+        for item in items:
+            row = Transaction(user=user, **item)
+            row.set_fingerprint()
+            rows.append(row)
 
+        keys = {row.idempotency_key for row in rows if row.idempotency_key}
+        lookup = Q(idempotency_key__in=keys)
+        if dedupe:
+            lookup |= Q(fingerprint__in={row.fingerprint for row in rows})
+        by_key, by_fingerprint = {}, {}
+        for existing in Transaction.objects.filter(lookup, user=user).select_related("category"):
+            by_key.setdefault(existing.idempotency_key, existing)
+            by_fingerprint.setdefault(existing.fingerprint, existing)
 
-class TransactionDetailView(generics.RetrieveUpdateDestroyAPIView):
+        results, new = [], []
+        for row in rows:
+            match = by_key.get(row.idempotency_key) if row.idempotency_key else None
+            if match is None and dedupe:
+                match = by_fingerprint.get(row.fingerprint)
+            if match is None:
+                if row.idempotency_key:
+                    by_key[row.idempotency_key] = row
+                by_fingerprint[row.fingerprint] = row
+                new.append(row)
+                match = row
+            results.append(match)
+
+        if len(new) == 1:
+            new[0].save()
+        elif new:
+            seq = next_change_seq(user.id)
+            for row in new:
+                row.change_seq = seq
+            Transaction.objects.bulk_create(new)
+            budgets.record_created(user.id, new)
+            jobs.enqueue(
+                "recompute_cells", user.id,
+                min(row.date for row in new), max(row.date for row in new),
+            )
+        return results, len(new)
+
+
+class TransactionDetailView(SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [TokenAuthentication]
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
\ No newline at end of file
+        return Transaction.objects.filter(user=self.request.user)
@@ -7,16 +7,25 @@ from accounts.api.views import (
     ProfileUpdateView,
     total_expenses,
     monthly_summary,
+    trends,
     monthly_pie_data,
     annual_summary,
     day_view,
+    calendar_range,
     CalendarListCreateView,
     CategoryListCreateView,
+    CategoryDetailView,
+    category_merge,
+    category_bulk_delete,
     BillDueListCreateView,
     BillDueDetailView,
     DeleteAccountView,
 )
 from accounts.api.transaction_views import TransactionListCreateView, TransactionDetailView
+from accounts.api.sync_views import sync
+from accounts.api.budget_views import BudgetListCreateView, BudgetDetailView, BudgetEventListView
+from accounts.api.anomaly_views import SpendingAnomalyListView
+from accounts.api.debt_views import debt_simulator
 
 urlpatterns = [
     # -------- AUTH --------
@@ -30,6 +39,9 @@ urlpatterns = [
 
     # -------- CATEGORIES & TRANSACTIONS --------
     path("categories/", CategoryListCreateView.as_view(), name="category-list-create"),
+    path("categories/<int:pk>/", CategoryDetailView.as_view(), name="category-detail"),
+    path("categories/merge/", category_merge, name="category-merge"),
+    path("categories/delete/", category_bulk_delete, name="category-bulk-delete"),
     path("transactions/", TransactionListCreateView.as_view(), name="transaction-list-create"),
     path("transactions/<int:pk>/", TransactionDetailView.as_view(), name="transaction-detail"),
     path("transactions/total-expenses/", total_expenses, name="total-expenses"),
@@ -37,13 +49,29 @@ urlpatterns = [
     # -------- CALENDAR & DAILY VIEW --------
     path("calendar/", CalendarListCreateView.as_view(), name="calendar-list-create"),
     path("calendar/<int:calendar_id>/day/<str:date_str>/", day_view, name="day-view"),
+    path("calendar/range/", calendar_range, name="calendar-range"),
 
     # -------- BILLS --------
     path("bills/", BillDueListCreateView.as_view(), name="bills-list-create"),
     path("bills/<int:pk>/", BillDueDetailView.as_view(), name="bill-detail"),
 
+    # -------- BUDGETS --------
+    path("budgets/", BudgetListCreateView.as_view(), name="budget-list-create"),
+    path("budgets/<int:pk>/", BudgetDetailView.as_view(), name="budget-detail"),
+    path("budgets/events/", BudgetEventListView.as_view(), name="budget-events"),
+
+    # -------- ANOMALIES --------
+    path("anomalies/", SpendingAnomalyListView.as_view(), name="anomaly-list"),
+
+    # -------- DEBTS --------
+    path("debts/simulate/", debt_simulator, name="debt-simulator"),
+
+    # -------- SYNC --------
+    path("sync/", sync, name="sync"),
+
     # -------- SUMMARIES --------
     path("summary/monthly/", monthly_summary, name="monthly-summary"),
     path("summary/annual/", annual_summary, name="annual-summary"),
+    path("summary/trends/", trends, name="trends"),
     path("monthly-pie-data/", monthly_pie_data, name="monthly-pie-data"),
 ]
\ No newline at end of file
@@ -3,25 +3,38 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from django.contrib.auth.models import User 
 from django.db.models.functions import TruncMonth, Coalesce
-from django.db import models
-from django.db.models import Sum, F, Value as V, DecimalField
+from django.db import models, transaction
+from django.db.models import Sum, Value as V
 from calendar import monthrange
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from itertools import chain
 from rest_framework.decorators import api_view, permission_classes
-from accounts.models import Profile, Category, Transaction, Calendar, CalendarCell, BillDue
+from accounts.models import Profile, Category, Transaction, Calendar, BillDue
+from accounts.fields import add_cents, cents_json, in_cents
+from accounts import archive, jobs
+from accounts.categories import annotate_usage, delete_categories, merge_categories
+from accounts.cells import ensure_calendars
+from accounts.db_routers import user_atomic
+from accounts.trends import monthly_trends
 from rest_framework.views import APIView
+from rest_framework.settings import api_settings
+from .mixins import SparseFieldsViewMixin
+from .renderers import CompactCalendarRenderer
 from .serializers import (
     UserSerializer,
-    CategorySerializer,
+    CategoryUsageSerializer,
+    CategoryBulkSerializer,
+    CategoryMergeSerializer,
     CalendarSerializer,
     BillDueSerializer,
     TransactionSerializer,
-    UserSerializer,
+    BillsByDate,
+    compact_calendars,
 )
-from accounts.api.serializers import CategorySerializer  
 
 
 # -------------------- PROFILE & USER VIEWS --------------------
@@ -57,21 +70,79 @@ class DeleteAccountView(generics.DestroyAPIView):
     def get_object(self):
         return self.request.user
 
+    def destroy(self, request, *args, **kwargs):
+        # Deactivate now; the job worker purges the data in set-based chunks.
+        user = self.get_object()
+        with transaction.atomic():
+            user.is_active = False
+            user.save(update_fields=['is_active'])
+            Token.objects.filter(user=user).delete()
+            jobs.enqueue('purge_user', user.id)
+        return Response(status=status.HTTP_202_ACCEPTED)
+
 
 # -------------------- CATEGORIES --------------------
-class CategoryListCreateView(generics.ListCreateAPIView):
-   
-    serializer_class = CategorySerializer
+CATEGORY_ORDERINGS = {'name', 'transaction_count', 'income_total', 'expense_total', 'last_used'}
+
+
+class CategoryListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
+    """
+    Categories with their transaction count, income and expense totals and
+    last-used date, all from one grouped query. ``?ordering=`` takes any of
+    CATEGORY_ORDERINGS, prefixed with ``-`` for descending (default ``name``).
+    """
+    serializer_class = CategoryUsageSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication]
 
     def get_queryset(self):
-        return Category.objects.filter(user=self.request.user).order_by('name')
+        ordering = self.request.query_params.get('ordering', 'name')
+        if ordering.lstrip('-') not in CATEGORY_ORDERINGS:
+            ordering = 'name'
+        return annotate_usage(Category.objects.filter(user=self.request.user)).order_by(ordering, 'id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
+class CategoryDetailView(SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
+
+    serializer_class = CategoryUsageSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+
+    def get_queryset(self):
+        return annotate_usage(Category.objects.filter(user=self.request.user))
+
+    def perform_destroy(self, instance):
+        delete_categories(self.request.user.id, [instance.pk])
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def category_merge(request):
+    """Fold ``ids`` into the category ``into``: its transactions, spend counters, budgets and anomalies."""
+    serializer = CategoryMergeSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    target = serializer.validated_data['into']
+    moved = merge_categories(request.user.id, serializer.validated_data['ids'], target)
+    data = CategoryUsageSerializer(target, context={'request': request}).data
+    return Response({'category': data, 'transactions_moved': moved})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def category_bulk_delete(request):
+    """Delete every category in ``ids``; their transactions become uncategorised."""
+    serializer = CategoryBulkSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    cleared = delete_categories(request.user.id, ids)
+    return Response({'deleted': len(ids), 'transactions_uncategorised': cleared})
+
+
 # -------------------- TRANSACTIONS (helpers) --------------------
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -81,9 +152,10 @@ def total_expenses(request):
     total = (
         Transaction.objects
         .filter(user=request.user, type='expense')
-        .aggregate(Sum('amount'))
+        .aggregate(total=in_cents(Sum('amount')))
     )
-    return Response({"total_expenses": total['amount__sum'] or 0})
+    archived = [expenses for _, expenses in archive.archived_monthly_totals(request.user.id).values()]
+    return Response({"total_expenses": cents_json(add_cents(total['total'], *archived))})
 
 
 # -------------------- MONTHLY SUMMARY --------------------
@@ -99,21 +171,58 @@ def monthly_summary(request):
         .annotate(month=TruncMonth('date'))
         .values('month')
         .annotate(
-            total_income=Coalesce(
-                Sum('amount', filter=models.Q(type='income')),
-                V(0),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            ),
-            total_expenses=Coalesce(
-                Sum('amount', filter=models.Q(type='expense')),
-                V(0),
-                output_field=DecimalField(max_digits=12, decimal_places=2)
-            )
+            total_income=in_cents(Coalesce(Sum('amount', filter=models.Q(type='income')), V(0))),
+            total_expenses=in_cents(Coalesce(Sum('amount', filter=models.Q(type='expense')), V(0))),
         )
-        .annotate(net_balance=F('total_income') - F('total_expenses'))
-        .order_by('-month')
     )
-    return Response(transactions)
+
+    # Totals stay integer cents until the response is built.
+    months = {row['month']: (row['total_income'], row['total_expenses']) for row in transactions}
+    for (year, month), (income, expenses) in archive.archived_monthly_totals(user.id).items():
+        total_income, total_expenses = months.get(date(year, month, 1), (0, 0))
+        months[date(year, month, 1)] = (total_income + income, total_expenses + expenses)
+    return Response([
+        {
+            'month': month,
+            'total_income': cents_json(income),
+            'total_expenses': cents_json(expenses),
+            'net_balance': cents_json(income - expenses),
+        }
+        for month, (income, expenses) in sorted(months.items(), reverse=True)
+    ])
+
+
+# -------------------- TRENDS --------------------
+MAX_TREND_MONTHS = 240
+
+
+def _parse_month(value):
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def trends(request):
+    """
+    Per-month income, expenses and net for ``?start=YYYY-MM&end=YYYY-MM``
+    (default: the last 12 months) with 3- and 12-month moving averages,
+    cumulative net and year-over-year change. See accounts.trends.
+    """
+    today = date.today().replace(day=1)
+    try:
+        end = _parse_month(request.query_params['end']) if 'end' in request.query_params else today
+        start = (
+            _parse_month(request.query_params['start']) if 'start' in request.query_params
+            else date(end.year - 1 + (end.month == 12), end.month % 12 + 1, 1)
+        )
+    except ValueError:
+        return Response({"error": "Use YYYY-MM for start and end."}, status=400)
+    months = (end.year - start.year) * 12 + end.month - start.month + 1
+    if not 0 < months <= MAX_TREND_MONTHS:
+        return Response({"error": f"start must be before end and at most {MAX_TREND_MONTHS} months apart."}, status=400)
+    return Response(monthly_trends(request.user.id, start, end))
 
 
 # -------------------- DAY VIEW --------------------
@@ -135,13 +244,17 @@ def day_view(request, calendar_id, date_str):
     transactions = Transaction.objects.filter(user=request.user, date=target_date)
     bills = BillDue.objects.filter(user=request.user, due_date=target_date)
 
+    archived = archive.archived_transactions(request.user.id, target_date, target_date)
+
     total_expenses = transactions.filter(type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
     total_income   = transactions.filter(type='income').aggregate(Sum('amount'))['amount__sum'] or 0
+    total_expenses += sum(tx['amount'] for tx in archived if tx['type'] == 'expense')
+    total_income   += sum(tx['amount'] for tx in archived if tx['type'] == 'income')
     net_balance    = total_income - total_expenses
 
     return Response({
         "date": target_date,
-        "transactions": list(
+        "transactions": archived + list(
             transactions.values('id', 'type', 'amount', 'category__name', 'description', 'date')
         ),
         "bills": list(
@@ -152,6 +265,65 @@ def day_view(request, calendar_id, date_str):
         "net_balance": net_balance,
     })
 
+# -------------------- CALENDAR RANGE --------------------
+MAX_RANGE_DAYS = 366
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([TokenAuthentication])
+def calendar_range(request):
+    """Per-day transactions, bills and totals for every date in [start, end]."""
+    try:
+        start = datetime.strptime(request.query_params.get('start', ''), "%Y-%m-%d").date()
+        end = datetime.strptime(request.query_params.get('end', ''), "%Y-%m-%d").date()
+    except ValueError:
+        return Response({"error": "start and end are required (use YYYY-MM-DD)"}, status=400)
+    if end < start:
+        return Response({"error": "end must not be before start"}, status=400)
+    if (end - start).days >= MAX_RANGE_DAYS:
+        return Response({"error": f"Range is limited to {MAX_RANGE_DAYS} days"}, status=400)
+
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        days[day] = {
+            "date": day,
+            "transactions": [],
+            "bills": [],
+            "total_expenses": 0,
+            "total_income": 0,
+            "net_balance": 0,
+        }
+
+    transactions = (
+        Transaction.objects
+        .filter(user=request.user, date__range=(start, end))
+        .order_by('date', 'id')
+        .values('id', 'type', 'amount', 'category__name', 'description', 'date')
+    )
+    for tx in chain(archive.archived_transactions(request.user.id, start, end), transactions):
+        day = days[tx['date']]
+        day["transactions"].append(tx)
+        if tx['type'] == 'income':
+            day["total_income"] += tx['amount']
+        else:
+            day["total_expenses"] += tx['amount']
+
+    bills = (
+        BillDue.objects
+        .filter(user=request.user, due_date__range=(start, end))
+        .order_by('due_date', 'id')
+        .values('id', 'name', 'amount', 'type', 'note', 'due_date', 'is_paid')
+    )
+    for bill in bills:
+        days[bill['due_date']]["bills"].append(bill)
+
+    for day in days.values():
+        day["net_balance"] = day["total_income"] - day["total_expenses"]
+
+    return Response({"start": start, "end": end, "days": list(days.values())})
+
 # -------------------- ANNUAL SUMMARY --------------------
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -163,26 +335,33 @@ def annual_summary(request):
     transactions = Transaction.objects.filter(user=user, date__year=year)
     bills = BillDue.objects.filter(user=user, due_date__year=year)
 
-    total_income = transactions.filter(type="income").aggregate(Sum("amount"))["amount__sum"] or 0
-    total_expenses = transactions.filter(type="expense").aggregate(Sum("amount"))["amount__sum"] or 0
-    total_bills = bills.aggregate(Sum("amount"))["amount__sum"] or 0
+    # Integer cents, None while nothing has been summed.
+    total_income = transactions.filter(type="income").aggregate(total=in_cents(Sum("amount")))["total"]
+    total_expenses = transactions.filter(type="expense").aggregate(total=in_cents(Sum("amount")))["total"]
+    total_bills = bills.aggregate(total=in_cents(Sum("amount")))["total"]
+    for income, expenses in archive.archived_monthly_totals(user.id, year).values():
+        total_income = add_cents(total_income, income)
+        total_expenses = add_cents(total_expenses, expenses)
 
-    total_balance = total_income - total_expenses - total_bills
+    total_balance = None
+    if (total_income, total_expenses, total_bills) != (None, None, None):
+        total_balance = (total_income or 0) - (total_expenses or 0) - (total_bills or 0)
 
     return Response({
         "year": year,
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "total_bills": total_bills,
-        "total_balance": total_balance,
+        "total_income": cents_json(total_income),
+        "total_expenses": cents_json(total_expenses),
+        "total_bills": cents_json(total_bills),
+        "total_balance": cents_json(total_balance),
     })
 
 # -------------------- CALENDAR --------------------
-class CalendarListCreateView(generics.ListCreateAPIView):
+class CalendarListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
    
     serializer_class = CalendarSerializer
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [TokenAuthentication]
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [CompactCalendarRenderer]
 
     def get_queryset(self):
         qs = Calendar.objects.filter(user=self.request.user).order_by('-year', '-month')
@@ -192,28 +371,57 @@ class CalendarListCreateView(generics.ListCreateAPIView):
             qs = qs.filter(month=month, year=year)
         return qs
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        span = getattr(self, 'calendar_span', None)
+        if span is not None:
+            # One bills query for the page's months instead of one per cell.
+            context["bills_by_date"] = BillsByDate(self.request.user.id, *span)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == CompactCalendarRenderer.format:
+            return Response(compact_calendars(self.get_queryset()))
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        calendars = list(page if page is not None else queryset)
+        if calendars:
+            first = min((c.year, c.month) for c in calendars)
+            last = max((c.year, c.month) for c in calendars)
+            self.calendar_span = (date(*first, 1), date(*last, monthrange(*last)[1]))
+        serializer = self.get_serializer(calendars, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     def perform_create(self, serializer):
         month = self.request.data.get('month')
         year  = self.request.data.get('year')
         if not month or not year:
             raise ValueError("month and year are required.")
 
-        existing = Calendar.objects.filter(user=self.request.user, month=month, year=year).first()
-        if existing:
-            return  
-
-        calendar = serializer.save(user=self.request.user, month=month, year=year)
-
-        _, num_days = monthrange(int(year), int(month))
-        for day in range(1, num_days + 1):
-            CalendarCell.objects.get_or_create(
-                calendar=calendar,
-                date=date(int(year), int(month), day)
+        with user_atomic(self.request.user.id):
+            existing = Calendar.objects.filter(user=self.request.user, month=month, year=year).first()
+            if existing:
+                serializer.instance = existing
+                return
+
+            # ON CONFLICT DO NOTHING: a concurrent create of the same month wins quietly.
+            calendars = ensure_calendars(self.request.user.id, [(int(year), int(month))])
+            serializer.instance = calendars[(int(year), int(month))]
+
+            # Cells and their totals are built by the job worker.
+            _, num_days = monthrange(int(year), int(month))
+            jobs.enqueue(
+                'provision_calendar',
+                self.request.user.id,
+                date(int(year), int(month), 1),
+                date(int(year), int(month), num_days),
             )
 
 
 # -------------------- BILLS --------------------
-class BillDueListCreateView(generics.ListCreateAPIView):
+class BillDueListCreateView(SparseFieldsViewMixin, generics.ListCreateAPIView):
     
     serializer_class = BillDueSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -231,7 +439,7 @@ class BillDueListCreateView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class BillDueDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BillDueDetailView(SparseFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     
     serializer_class = BillDueSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -259,21 +467,28 @@ def monthly_pie_data(request):
     user = request.user
     year = int(request.query_params.get('year', datetime.now().year))
 
+    archived = archive.archived_monthly_totals(user.id, year)
+
     monthly_data = []
     for month in range(1, 13):
         transactions = Transaction.objects.filter(user=user, date__year=year, date__month=month)
         bills = BillDue.objects.filter(user=user, due_date__year=year, due_date__month=month)
 
-        total_income = transactions.filter(type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expenses = transactions.filter(type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        total_bills = bills.aggregate(Sum('amount'))['amount__sum'] or 0
+        # Integer cents, None while nothing has been summed.
+        total_income = transactions.filter(type='income').aggregate(total=in_cents(Sum('amount')))['total']
+        total_expenses = transactions.filter(type='expense').aggregate(total=in_cents(Sum('amount')))['total']
+        total_bills = bills.aggregate(total=in_cents(Sum('amount')))['total']
+        if (year, month) in archived:
+            archived_income, archived_expenses = archived[(year, month)]
+            total_income = add_cents(total_income, archived_income)
+            total_expenses = add_cents(total_expenses, archived_expenses)
 
-        if total_income > 0 or total_expenses > 0 or total_bills > 0:
+        if (total_income or 0) > 0 or (total_expenses or 0) > 0 or (total_bills or 0) > 0:
             monthly_data.append({
                 "month": month,
-                "total_income": total_income,
-                "total_expenses": total_expenses,
-                "total_bills": total_bills,
+                "total_income": cents_json(total_income),
+                "total_expenses": cents_json(total_expenses),
+                "total_bills": cents_json(total_bills),
             })
 
     return Response({
@@ -0,0 +1,236 @@
+"""
+Cold storage for old transactions.
+
+``archive_year`` moves one user's transactions for a year out of the
+Transaction table into a TransactionArchive row: gzipped NDJSON, one record
+per transaction, amounts in cents. The moved ids get Tombstones, so delta sync
+clients drop them as they would deleted rows. CalendarCells are left alone and the
+archive keeps per-month totals, so summaries stay exact without touching the
+blob, and an ArchivedCategoryUsage row per category, so category usage counts
+archived rows too. Reads of archived days decompress a year on first use and
+keep the parsed result in a small per-process cache.
+
+Records keep the category id and name they had when archived; ``recategorise``
+rewrites them when categories are merged or deleted.
+"""
+import gzip
+import json
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from django.db import router
+
+from accounts.db_routers import user_atomic
+from accounts.fields import CENTS
+from accounts.models import (
+    ArchivedCategoryUsage, Category, Tombstone, Transaction, TransactionArchive, next_change_seq,
+)
+
+
+ROW_FIELDS = ('id', 'type', 'amount', 'category_id', 'category__name', 'description', 'date')
+DELETE_BATCH = 1000
+
+
+def _money(cents):
+    return (Decimal(cents) / 100).quantize(CENTS)
+
+
+def _encode(records):
+    lines = (json.dumps(record, separators=(',', ':')) for record in records)
+    return gzip.compress('\n'.join(lines).encode())
+
+
+def _decode(data):
+    return [json.loads(line) for line in gzip.decompress(bytes(data)).decode().splitlines()]
+
+
+def _monthly_totals(records):
+    totals = defaultdict(lambda: [0, 0])
+    for record in records:
+        month = int(record['date'][5:7])
+        totals[str(month)][0 if record['type'] == 'income' else 1] += record['amount']
+    return dict(totals)
+
+
+def _store_usage(archive, records):
+    """Replace the archive's ArchivedCategoryUsage rows with figures from ``records``."""
+    usage = defaultdict(lambda: [0, 0, 0, ''])
+    for record in records:
+        if record['category_id'] is not None:
+            row = usage[record['category_id']]
+            row[0] += 1
+            row[1 if record['type'] == 'income' else 2] += record['amount']
+            row[3] = max(row[3], record['date'])
+    # Categories deleted before their archived rows were cleared have nothing to count against.
+    existing = set(
+        Category.objects.filter(user_id=archive.user_id, pk__in=list(usage)).values_list('pk', flat=True)
+    )
+    ArchivedCategoryUsage.objects.filter(user_id=archive.user_id, year=archive.year).delete()
+    ArchivedCategoryUsage.objects.bulk_create([
+        ArchivedCategoryUsage(
+            user_id=archive.user_id,
+            category_id=category_id,
+            year=archive.year,
+            transaction_count=count,
+            income_total=_money(income),
+            expense_total=_money(expenses),
+            last_used=date.fromisoformat(last_used),
+        )
+        for category_id, (count, income, expenses, last_used) in usage.items()
+        if category_id in existing
+    ])
+
+
+# ---------- WRITING -------------------------------------------------------------------
+def archive_year(user_id, year):
+    """Move the user's transactions dated in ``year`` into their archive; returns the count."""
+    with user_atomic(user_id):
+        archive = (
+            TransactionArchive.objects.select_for_update()
+            .filter(user_id=user_id, year=year)
+            .first()
+        )
+        rows = list(
+            Transaction.objects
+            .filter(user_id=user_id, date__year=year)
+            .select_for_update()
+            .values(*ROW_FIELDS)
+        )
+        if not rows:
+            return 0
+
+        records = _decode(archive.data) if archive else []
+        records += [
+            {
+                'id': row['id'],
+                'type': row['type'],
+                'amount': int(row['amount'] * 100),
+                'category_id': row['category_id'],
+                'category': row['category__name'],
+                'description': row['description'],
+                'date': row['date'].isoformat(),
+            }
+            for row in rows
+        ]
+        records.sort(key=lambda record: (record['date'], record['id']))
+
+        if archive is None:
+            archive = TransactionArchive(user_id=user_id, year=year)
+        archive.data = _encode(records)
+        archive.monthly_totals = _monthly_totals(records)
+        archive.row_count = len(records)
+        archive.save()
+        _store_usage(archive, records)
+
+        # Raw deletes skip the per-row post_delete recompute: the cells keep their totals.
+        ids = [row['id'] for row in rows]
+        using = router.db_for_write(Transaction)
+        for offset in range(0, len(ids), DELETE_BATCH):
+            Transaction.objects.filter(pk__in=ids[offset:offset + DELETE_BATCH])._raw_delete(using)
+        change_seq = next_change_seq(user_id)
+        Tombstone.objects.bulk_create(
+            [
+                Tombstone(user_id=user_id, model=Transaction._meta.model_name, object_id=pk, change_seq=change_seq)
+                for pk in ids
+            ],
+            batch_size=DELETE_BATCH,
+        )
+    return len(rows)
+
+
+def recategorise(user_id, ids, target=None):
+    """
+    Point the user's archived rows in the categories ``ids`` at ``target``, or
+    leave them uncategorised when it is None; returns how many rows changed.
+    Only the years whose usage rows mention ``ids`` are decompressed.
+    """
+    changed = 0
+    with user_atomic(user_id):
+        years = ArchivedCategoryUsage.objects.filter(user_id=user_id, category_id__in=ids).values('year')
+        for archive in TransactionArchive.objects.select_for_update().filter(user_id=user_id, year__in=years):
+            records = _decode(archive.data)
+            for record in records:
+                if record['category_id'] in ids:
+                    record['category_id'] = target.pk if target else None
+                    record['category'] = target.name if target else None
+                    changed += 1
+            archive.data = _encode(records)
+            archive.save(update_fields=['data', 'updated_at'])
+            _store_usage(archive, records)
+    return changed
+
+
+def remap_categories(archive, categories):
+    """Map the category ids in ``archive``'s records through ``categories`` ({old: new}), unsaved."""
+    records = _decode(archive.data)
+    for record in records:
+        if record['category_id'] is not None:
+            record['category_id'] = categories.get(record['category_id'])
+            if record['category_id'] is None:
+                record['category'] = None
+    archive.data = _encode(records)
+
+
+# ---------- READING -------------------------------------------------------------------
+@lru_cache(maxsize=64)
+def _days(archive_id, updated_at):
+    """Rows of one archive grouped by date; keyed on updated_at so rewrites miss."""
+    data = TransactionArchive.objects.values_list('data', flat=True).get(pk=archive_id)
+    days = defaultdict(list)
+    for record in _decode(data):
+        day = date.fromisoformat(record['date'])
+        days[day].append({
+            'id': record['id'],
+            'type': record['type'],
+            'amount': _money(record['amount']),
+            'category__name': record['category'],
+            'description': record['description'],
+            'date': day,
+        })
+    return dict(days)
+
+
+def _archives_between(user_id, start, end):
+    return (
+        TransactionArchive.objects
+        .filter(user_id=user_id, year__gte=start.year, year__lte=end.year)
+        .values_list('pk', 'updated_at')
+    )
+
+
+def archived_transactions(user_id, start, end):
+    """Archived rows dated in [start, end], shaped like Transaction ``values()`` rows."""
+    rows = []
+    for pk, updated_at in _archives_between(user_id, start, end):
+        for day, day_rows in _days(pk, updated_at).items():
+            if start <= day <= end:
+                rows.extend(dict(row) for row in day_rows)
+    rows.sort(key=lambda row: (row['date'], row['id']))
+    return rows
+
+
+def archived_daily_totals(user_id, start, end):
+    """``{date: (income, expenses)}`` for archived days in [start, end]."""
+    totals = {}
+    for row in archived_transactions(user_id, start, end):
+        income, expenses = totals.get(row['date'], (0, 0))
+        if row['type'] == 'income':
+            income += row['amount']
+        else:
+            expenses += row['amount']
+        totals[row['date']] = (income, expenses)
+    return totals
+
+
+def archived_monthly_totals(user_id, year=None):
+    """``{(year, month): (income, expenses)}`` in cents from the stored rollups, no decompression."""
+    archives = TransactionArchive.objects.filter(user_id=user_id)
+    if year is not None:
+        archives = archives.filter(year=year)
+    return {
+        (archived_year, int(month)): (income, expenses)
+        for archived_year, monthly in archives.values_list('year', 'monthly_totals')
+        for month, (income, expenses) in monthly.items()
+    }
@@ -0,0 +1,200 @@
+"""
+Budget spend tracking.
+
+Every expense with a category adds its amount to a CategorySpend counter for
+(category, month). Transaction.save() and delete() call ``record_change`` with
+the row's contribution before and after the write, so the counters move by
+deltas inside the writing transaction and never need re-summing. Bulk paths
+(bulk_create, queryset update/delete) skip save(). They must call
+``record_created`` or ``rebuild_spend`` themselves. Archiving is the one
+intentional exception: archived expenses still count.
+
+A budget's spend for a period is then one or twelve counters. Thresholds are
+checked at write time: when a change moves spend across one of
+BUDGET_ALERT_THRESHOLDS, a BudgetEvent is stored and a ``budget`` event goes to
+the user's streams.
+"""
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+
+from accounts import events
+from accounts.db_routers import user_shard
+from accounts.fields import CENTS, MoneyField
+from accounts.models import Budget, BudgetEvent, CategorySpend, Transaction
+
+
+def _money(cents):
+    return (Decimal(cents) / 100).quantize(CENTS)
+
+
+def _cents(amount):
+    return MoneyField().get_prep_value(amount)
+
+
+def period_bounds(period, day):
+    """First and last day of the monthly or yearly budget period containing ``day``."""
+    if period == 'yearly':
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    return day.replace(day=1), day.replace(day=monthrange(day.year, day.month)[1])
+
+
+# ---------- WRITING -------------------------------------------------------------------
+def record_change(user_id, before, after):
+    """Move the counters from one ``Transaction.spend_entry()`` to another."""
+    deltas = defaultdict(int)
+    if before is not None:
+        deltas[before[:2]] -= before[2]
+    if after is not None:
+        deltas[after[:2]] += after[2]
+    apply_deltas(user_id, deltas)
+
+
+def record_created(user_id, transactions):
+    """Count transactions written without save(), e.g. by bulk_create()."""
+    deltas = defaultdict(int)
+    for tx in transactions:
+        entry = tx.spend_entry()
+        if entry is not None:
+            deltas[entry[:2]] += entry[2]
+    apply_deltas(user_id, deltas)
+
+
+def apply_deltas(user_id, deltas):
+    """Add ``{(category_id, month): cents}`` to the counters, then check thresholds."""
+    deltas = {key: cents for key, cents in deltas.items() if cents}
+    if not deltas:
+        return
+    with user_shard(user_id):
+        _apply_deltas(user_id, deltas)
+
+
+def _apply_deltas(user_id, deltas):
+    missing = [
+        CategorySpend(user_id=user_id, category_id=category_id, month=month)
+        for (category_id, month), cents in deltas.items()
+        if not CategorySpend.objects.filter(category_id=category_id, month=month)
+        .update(spent=F('spent') + cents)
+    ]
+    if missing:
+        # ON CONFLICT DO NOTHING, then increment: safe when two writers create the same counter.
+        CategorySpend.objects.bulk_create(missing, ignore_conflicts=True)
+        for counter in missing:
+            CategorySpend.objects.filter(category_id=counter.category_id, month=counter.month).update(
+                spent=F('spent') + deltas[(counter.category_id, counter.month)]
+            )
+    check_thresholds(user_id, {key: cents for key, cents in deltas.items() if cents > 0})
+
+
+def rebuild_spend(user_id):
+    """Recount all of a user's counters from their transactions."""
+    CategorySpend.objects.filter(user_id=user_id).delete()
+    rows = (
+        Transaction.objects
+        .filter(user_id=user_id, type='expense', category__isnull=False)
+        .annotate(month=TruncMonth('date'))
+        .values('category_id', 'month')
+        .annotate(spent=Sum('amount'))
+    )
+    CategorySpend.objects.bulk_create([
+        CategorySpend(user_id=user_id, category_id=row['category_id'], month=row['month'], spent=row['spent'])
+        for row in rows
+    ])
+
+
+# ---------- THRESHOLDS ----------------------------------------------------------------
+def check_thresholds(user_id, increases):
+    """Record and announce the thresholds that ``{(category_id, month): cents}`` crossed."""
+    if not increases:
+        return
+    budgets = list(Budget.objects.filter(category_id__in={c for c, _ in increases}))
+    if not budgets:
+        return
+    spend = period_spend(budgets, [month for _, month in increases])
+
+    crossed = []
+    for budget in budgets:
+        limit = _cents(budget.limit)
+        if limit <= 0:
+            continue
+        periods = defaultdict(int)
+        for (category_id, month), cents in increases.items():
+            if category_id == budget.category_id:
+                periods[period_bounds(budget.period, month)[0]] += cents
+        for start, added in periods.items():
+            now = _cents(spend.get((budget.pk, start), 0))
+            for threshold in settings.BUDGET_ALERT_THRESHOLDS:
+                if (now - added) * 100 < limit * threshold <= now * 100:
+                    crossed.append(BudgetEvent(
+                        budget=budget, period_start=start, threshold=threshold, spent=_money(now),
+                    ))
+    if crossed:
+        BudgetEvent.objects.bulk_create(crossed, ignore_conflicts=True)
+        events.publish(user_id, 'budget', [
+            [event.budget_id, event.period_start, event.threshold, event.spent] for event in crossed
+        ])
+
+
+# ---------- READING -------------------------------------------------------------------
+def period_spend(budgets, days):
+    """
+    ``{(budget_id, period_start): spent}`` for the periods of ``budgets`` that
+    contain any of ``days``, read from the counters in one query.
+    """
+    wanted = {
+        (budget.pk, *period_bounds(budget.period, day))
+        for budget in budgets for day in days
+    }
+    if not wanted:
+        return {}
+    first = min(start for _, start, _ in wanted)
+    last = max(end for _, _, end in wanted)
+    by_category = defaultdict(list)
+    for budget in budgets:
+        by_category[budget.category_id].append(budget)
+
+    spend = defaultdict(Decimal)
+    counters = CategorySpend.objects.filter(
+        category_id__in=by_category, month__range=(first.replace(day=1), last)
+    ).values_list('category_id', 'month', 'spent')
+    for category_id, month, spent in counters:
+        for budget in by_category[category_id]:
+            start, end = period_bounds(budget.period, month)
+            if (budget.pk, start, end) in wanted:
+                spend[(budget.pk, start)] += spent
+    return spend
+
+
+def budget_status(budget, spent, today):
+    """Spent, remaining and pace of ``budget`` in the period containing ``today``."""
+    start, end = period_bounds(budget.period, today)
+    days = (end - start).days + 1
+    elapsed = min(max((today - start).days + 1, 0), days) / days
+    projected = (spent / Decimal(elapsed)).quantize(CENTS) if elapsed else spent
+    used = spent / budget.limit if budget.limit else None
+    return {
+        'period_start': start,
+        'period_end': end,
+        'spent': spent,
+        'remaining': budget.limit - spent,
+        'percent_used': round(used * 100, 1) if used is not None else None,
+        'period_elapsed': round(elapsed * 100, 1),
+        'projected': projected,
+        # Above 1.0 means spending faster than the limit allows for this point in the period.
+        'pace': round(used / Decimal(elapsed), 2) if used is not None and elapsed else None,
+    }
+
+
+def attach_status(budgets, today=None):
+    """Set ``budget.status`` (see budget_status) on each budget with one counter query."""
+    today = today or date.today()
+    spend = period_spend(budgets, [today])
+    for budget in budgets:
+        start, _ = period_bounds(budget.period, today)
+        budget.status = budget_status(budget, spend.get((budget.pk, start), Decimal('0.00')), today)
+    return budgets
@@ -0,0 +1,124 @@
+"""
+Category usage and set-based category changes.
+
+``annotate_usage`` adds each category's transaction count, income and expense
+totals and last-used date in the same grouped query as the categories
+themselves, archived years included through their ArchivedCategoryUsage rows.
+
+``merge_categories`` and ``delete_categories`` take any number of categories
+at a fixed number of statements. Transactions are re-pointed, or cleared, by a
+single UPDATE that also stamps change_seq for sync, and every removed category
+gets its Tombstone in one INSERT. Only the rollups keyed by category are
+touched: merged categories' CategorySpend counters are added to the target's
+(which checks its budget thresholds), their budgets move to the target unless
+it already has one for that period, and their anomalies are re-pointed.
+Deleted categories take their counters, budgets and anomalies with them.
+Archived rows are re-pointed, or cleared, in the archive years that hold them
+(see accounts.archive.recategorise). Calendar cells and archive monthly totals
+do not depend on category and are left alone.
+"""
+from django.db.models import Count, ExpressionWrapper, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from accounts import budgets
+from accounts.archive import recategorise
+from accounts.db_routers import user_atomic, user_shard
+from accounts.fields import MoneyField
+from accounts.models import (
+    ArchivedCategoryUsage, Budget, Category, CategorySpend, SpendingAnomaly, Tombstone, Transaction, next_change_seq,
+)
+
+
+USAGE_FIELDS = ['transaction_count', 'income_total', 'expense_total', 'last_used']
+
+
+def annotate_usage(queryset):
+    """Category queryset with USAGE_FIELDS annotated from its transactions, live and archived."""
+    def archived(field, aggregate=Sum):
+        return Subquery(
+            ArchivedCategoryUsage.objects.filter(category=OuterRef('pk'))
+            .values('category').annotate(value=aggregate(field)).values('value')
+        )
+
+    def total(type, field):
+        return ExpressionWrapper(
+            Coalesce(Sum('transactions__amount', filter=Q(transactions__type=type)), Value(0))
+            + Coalesce(archived(field), Value(0)),
+            output_field=MoneyField(),
+        )
+
+    live_last, archived_last = Max('transactions__date'), archived('last_used', Max)
+    return queryset.annotate(
+        transaction_count=Count('transactions') + Coalesce(archived('transaction_count'), Value(0), output_field=IntegerField()),
+        income_total=total('income', 'income_total'),
+        expense_total=total('expense', 'expense_total'),
+        # Greatest() is NULL on SQLite as soon as one side is, so fill each side with the other.
+        last_used=Greatest(Coalesce(live_last, archived_last), Coalesce(archived_last, live_last)),
+    )
+
+
+def attach_usage(categories):
+    """Set USAGE_FIELDS on categories loaded without them, with one query."""
+    usage = {
+        row['pk']: row
+        for row in annotate_usage(Category.objects.filter(pk__in=[c.pk for c in categories]))
+        .values('pk', *USAGE_FIELDS)
+    }
+    for category in categories:
+        for name in USAGE_FIELDS:
+            setattr(category, name, usage[category.pk][name])
+    return categories
+
+
+def _remove(user_id, ids, change_seq):
+    """Delete categories whose transactions have already been moved or cleared."""
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, model=Category._meta.model_name, object_id=pk, change_seq=change_seq)
+        for pk in ids
+    ])
+    Category.objects.filter(user_id=user_id, pk__in=ids).delete()
+
+
+def merge_categories(user_id, ids, target):
+    """Fold the categories ``ids`` into ``target``; returns how many transactions moved."""
+    ids = set(ids) - {target.pk}
+    if not ids:
+        return 0
+    with user_shard(user_id), user_atomic(user_id):
+        change_seq = next_change_seq(user_id)
+        moved = Transaction.objects.filter(user_id=user_id, category_id__in=ids).update(
+            category=target, change_seq=change_seq
+        )
+        moved += recategorise(user_id, ids, target)
+
+        # One budget per period: the target's own, else the oldest among the merged ones.
+        moving = {period: None for period in Budget.objects.filter(category=target).values_list('period', flat=True)}
+        for pk, period in Budget.objects.filter(category_id__in=ids).order_by('pk').values_list('pk', 'period'):
+            moving.setdefault(period, pk)
+        Budget.objects.filter(pk__in=[pk for pk in moving.values() if pk]).update(category=target)
+        SpendingAnomaly.objects.filter(category_id__in=ids).update(category=target)
+
+        cents = MoneyField().get_prep_value
+        spend = (
+            CategorySpend.objects.filter(category_id__in=ids)
+            .values('month').annotate(spent=Sum('spent')).values_list('month', 'spent')
+        )
+        budgets.apply_deltas(user_id, {(target.pk, month): cents(spent) for month, spent in spend})
+
+        _remove(user_id, ids, change_seq)
+    return moved
+
+
+def delete_categories(user_id, ids):
+    """Delete the categories ``ids``, leaving their transactions uncategorised; returns how many were."""
+    ids = set(ids)
+    if not ids:
+        return 0
+    with user_shard(user_id), user_atomic(user_id):
+        change_seq = next_change_seq(user_id)
+        cleared = Transaction.objects.filter(user_id=user_id, category_id__in=ids).update(
+            category=None, change_seq=change_seq
+        )
+        cleared += recategorise(user_id, ids)
+        _remove(user_id, ids, change_seq)
+    return cleared
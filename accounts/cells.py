@@ -0,0 +1,222 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connections, router
+from django.db.models import Q, Sum
+
+from accounts.archive import archived_daily_totals
+from accounts.db_routers import user_atomic, using_shard
+from accounts.events import publish_cells
+from accounts.models import Transaction, TransactionArchive, Calendar, CalendarCell
+
+
+def _months_between(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def _dates_between(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def daily_totals(user_id, start, end):
+    """Income/expense totals per day in [start, end], archived days included."""
+    rows = (
+        Transaction.objects
+        .filter(user_id=user_id, date__range=(start, end))
+        .values('date')
+        .annotate(
+            income=Sum('amount', filter=Q(type='income')),
+            expenses=Sum('amount', filter=Q(type='expense')),
+        )
+    )
+    totals = {row['date']: (row['income'] or 0, row['expenses'] or 0) for row in rows}
+    for day, (income, expenses) in archived_daily_totals(user_id, start, end).items():
+        hot_income, hot_expenses = totals.get(day, (0, 0))
+        totals[day] = (hot_income + income, hot_expenses + expenses)
+    return totals
+
+
+CELL_TOTALS = ['total_income', 'total_expenses', 'net_balance']
+
+
+def ensure_calendars(user_id, months):
+    """
+    ``{(year, month): Calendar}`` for the given months, creating missing ones
+    with a single INSERT ... ON CONFLICT DO NOTHING so concurrent callers
+    never collide on the (user, month, year) constraint.
+    """
+    months = set(months)
+    if not months:
+        return {}
+    Calendar.objects.bulk_create(
+        [Calendar(user_id=user_id, year=year, month=month) for year, month in months],
+        ignore_conflicts=True,
+    )
+    calendars = Calendar.objects.filter(user_id=user_id, year__in={year for year, _ in months})
+    return {(c.year, c.month): c for c in calendars if (c.year, c.month) in months}
+
+
+def upsert_cells(cells, batch_size=None):
+    """Write cells with INSERT ... ON CONFLICT (calendar, date) DO UPDATE of their totals."""
+    return CalendarCell.objects.bulk_create(
+        cells,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['calendar', 'date'],
+        update_fields=CELL_TOTALS,
+    )
+
+
+# First key of the two-key advisory locks that serialize a user's recomputes.
+RECOMPUTE_LOCK_NAMESPACE = 4101
+
+
+def _lock_recomputes(user_id):
+    """
+    Take a transaction-level advisory lock on ``user_id``'s recomputes
+    (PostgreSQL). It excludes only other recomputes of the user: transaction,
+    bill and calendar writes never wait on it. Other backends serialize writers
+    anyway.
+    """
+    connection = connections[router.db_for_write(CalendarCell)]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # int4 keys; ids past 2**31 just share a lock with another user now and then.
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(%s, %s)', [RECOMPUTE_LOCK_NAMESPACE, user_id % 2**31]
+        )
+
+
+def recompute_cells(user_id, start, end, fill=False):
+    """
+    Rebuild CalendarCell totals for a user's days in [start, end].
+
+    Changed and new cells are written in one upsert (ON CONFLICT on the
+    calendar/date constraint), so concurrent recomputes never collide on
+    inserts. Cells are created for days that have transactions, or for every
+    day in the range when ``fill`` is set. Recomputes of one user hold an
+    advisory lock, so the totals read here include every transaction committed
+    before it was taken and a slower, older recompute cannot overwrite a newer
+    one.
+    """
+    with user_atomic(user_id):
+        _lock_recomputes(user_id)
+        totals = daily_totals(user_id, start, end)
+
+        existing = {
+            cell.date: cell
+            for cell in CalendarCell.objects.filter(
+                calendar__user_id=user_id, date__range=(start, end)
+            )
+        }
+        wanted = set(_dates_between(start, end)) if fill else set(totals) | set(existing)
+        calendars = ensure_calendars(
+            user_id,
+            _months_between(start, end) if fill else {(d.year, d.month) for d in wanted - set(existing)},
+        )
+
+        changed = []
+        for day in sorted(wanted):
+            income, expenses = totals.get(day, (0, 0))
+            cell = existing.get(day)
+            if cell is not None and (cell.total_income, cell.total_expenses) == (income, expenses):
+                continue
+            changed.append(CalendarCell(
+                calendar_id=cell.calendar_id if cell else calendars[(day.year, day.month)].pk,
+                date=day,
+                total_income=income,
+                total_expenses=expenses,
+                net_balance=income - expenses,
+            ))
+
+        upsert_cells(changed)
+        publish_cells(user_id, changed)
+
+
+# ---------- CONSISTENCY CHECK ---------------------------------------------------------
+def audit_user_range(first_id, last_id, repair=False, batch_size=1000):
+    """
+    Compare every cell of users ``first_id..last_id`` against one grouped
+    Transaction aggregate and optionally repair the drift.
+
+    Returns a stats dict: users, cells, drifted, missing, repaired and the
+    absolute net-balance drift (total and largest). Archived years are skipped;
+    checking them would mean decompressing every archive.
+    """
+    archived = set(
+        TransactionArchive.objects
+        .filter(user_id__gte=first_id, user_id__lte=last_id)
+        .values_list('user_id', 'year')
+    )
+    expected = {
+        (row['user_id'], row['date']): (row['income'] or 0, row['expenses'] or 0)
+        for row in (
+            Transaction.objects
+            .filter(user_id__gte=first_id, user_id__lte=last_id)
+            .values('user_id', 'date')
+            .annotate(
+                income=Sum('amount', filter=Q(type='income')),
+                expenses=Sum('amount', filter=Q(type='expense')),
+            )
+        )
+        if (row['user_id'], row['date'].year) not in archived
+    }
+    cells = (
+        CalendarCell.objects
+        .filter(calendar__user_id__gte=first_id, calendar__user_id__lte=last_id)
+        .values_list('id', 'calendar__user_id', 'date', 'total_income', 'total_expenses', 'net_balance')
+    )
+
+    stats = {'users': set(), 'cells': 0, 'drifted': 0, 'missing': 0, 'repaired': 0,
+             'total_drift': 0, 'max_drift': 0}
+    drifted, seen = [], set()
+    for pk, user_id, day, income, expenses, net in cells.iterator(chunk_size=batch_size):
+        if (user_id, day.year) in archived:
+            continue
+        stats['users'].add(user_id)
+        stats['cells'] += 1
+        seen.add((user_id, day))
+        want_income, want_expenses = expected.get((user_id, day), (0, 0))
+        if (income, expenses, net) != (want_income, want_expenses, want_income - want_expenses):
+            drift = abs(net - (want_income - want_expenses))
+            stats['drifted'] += 1
+            stats['total_drift'] += drift
+            stats['max_drift'] = max(stats['max_drift'], drift)
+            drifted.append((user_id, day))
+
+    missing = [key for key in expected if key not in seen]
+    stats['missing'] = len(missing)
+    stats['users'] |= {user_id for user_id, _ in missing}
+    for user_id, day in missing:
+        want_income, want_expenses = expected[(user_id, day)]
+        stats['total_drift'] += abs(want_income - want_expenses)
+        stats['max_drift'] = max(stats['max_drift'], abs(want_income - want_expenses))
+
+    if repair:
+        # The totals above were read without the recompute lock and may be stale
+        # by now; recompute_cells() re-reads them under it and only writes cells
+        # that still differ.
+        days = defaultdict(list)
+        for user_id, day in drifted + missing:
+            days[user_id].append(day)
+        for user_id, user_days in days.items():
+            recompute_cells(user_id, min(user_days), max(user_days))
+        stats['repaired'] = len(drifted) + len(missing)
+
+    stats['users'] = len(stats['users'])
+    return stats
+
+
+def audit_shard_range(shard, first_id, last_id, repair=False):
+    """audit_user_range() against the cells and transactions stored on ``shard``."""
+    with using_shard(shard):
+        return audit_user_range(first_id, last_id, repair)
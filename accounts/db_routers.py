@@ -0,0 +1,225 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+REPLICA_ALIAS = "replica"
+
+# Set per request by ReplicaRoutingMiddleware; False means "read from the primary".
+_read_from_replica = ContextVar("read_from_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Route ORM reads inside the block to the replica (if one is configured)."""
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+# ---------- PRIMARY / REPLICA ROUTER --------------------------------------------------
+# Authentication reads these on every request; a lagging replica would reject a
+# token issued a moment ago and keep accepting a revoked one.
+PRIMARY_READ_MODELS = {"authtoken.token", "auth.user"}
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to the replica only when the current request opted in,
+    everything else (writes, migrations, read-after-write, auth lookups) goes
+    to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _read_from_replica.get()
+            and replica_configured()
+            and model._meta.label_lower not in PRIMARY_READ_MODELS
+        ):
+            return REPLICA_ALIAS
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data.
+        return True
+
+
+# ---------- SHARDS --------------------------------------------------------------------
+# Per-user data lives on one shard: 'default' or a DATABASE_SHARD_URLS alias.
+# Everything else (auth, profiles, tombstones, jobs, the shard map) stays on 'default'.
+DEFAULT_SHARD = "default"
+SHARDED_MODELS = {
+    "category", "transaction", "transactionarchive", "archivedcategoryusage", "billdue", "calendar",
+    "calendarcell", "budget", "budgetevent", "categoryspend", "spendinganomaly",
+}
+
+# Shard of the user the current request or job acts for; None means 'default'.
+_current_shard = ContextVar("current_shard", default=None)
+
+
+def shard_aliases():
+    return [DEFAULT_SHARD, *settings.DATABASE_SHARDS]
+
+
+def pick_shard(user_id):
+    """Shard for a new user, spread by id; None when sharding is off."""
+    if not settings.DATABASE_SHARDS:
+        return None
+    aliases = shard_aliases()
+    return aliases[user_id % len(aliases)]
+
+
+def _shard_cache_key(user_id):
+    return f"user-shard:{user_id}"
+
+
+def _assigned_shard(user_id, lock=False):
+    """
+    Shard from the user's ShardAssignment row. With ``lock`` the row is
+    share-locked (PostgreSQL) until the surrounding transaction ends, so a
+    concurrent move_user waits for this writer and later writers see its switch.
+    """
+    from django.db import connections
+
+    from accounts.models import ShardAssignment
+
+    rows = ShardAssignment.objects.using(DEFAULT_SHARD).filter(user_id=user_id).values_list("shard", flat=True)
+    connection = connections[DEFAULT_SHARD]
+    if lock and connection.vendor == "postgresql":
+        sql, params = rows.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} FOR SHARE", params)
+            row = cursor.fetchone()
+        return row[0] if row else DEFAULT_SHARD
+    return rows.first() or DEFAULT_SHARD
+
+
+def shard_for_user(user_id, fresh=False):
+    """
+    The alias holding ``user_id``'s data; users without an assignment live on
+    'default'. Lookups are cached for SHARD_CACHE_SECONDS, so after a move a
+    process may keep reading the old shard that long; ``fresh`` skips the cache.
+    """
+    if not settings.DATABASE_SHARDS:
+        return DEFAULT_SHARD
+    from django.core.cache import cache
+
+    key = _shard_cache_key(user_id)
+    shard = None if fresh else cache.get(key)
+    if shard is None:
+        shard = _assigned_shard(user_id)
+        cache.set(key, shard, settings.SHARD_CACHE_SECONDS)
+    return shard
+
+
+def forget_shard(user_id):
+    from django.core.cache import cache
+
+    cache.delete(_shard_cache_key(user_id))
+
+
+@contextmanager
+def using_shard(alias):
+    """Route sharded-model queries inside the block to ``alias``."""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def user_shard(user_id):
+    """Route sharded-model queries inside the block to ``user_id``'s shard."""
+    return using_shard(shard_for_user(user_id))
+
+
+@contextmanager
+def user_atomic(user_id):
+    """
+    transaction.atomic() on 'default' and, if different, on the user's shard.
+
+    With sharding on, the shard is read from the (share-locked) ShardAssignment
+    rather than the cache and the block is routed to it, so writes never land
+    on a shard the user has just been moved off. Yields that shard's alias.
+    """
+    from django.db import transaction
+
+    if not settings.DATABASE_SHARDS:
+        with transaction.atomic(using=DEFAULT_SHARD):
+            yield DEFAULT_SHARD
+        return
+
+    from django.core.cache import cache
+
+    with transaction.atomic(using=DEFAULT_SHARD):
+        shard = _assigned_shard(user_id, lock=True)
+        cache.set(_shard_cache_key(user_id), shard, settings.SHARD_CACHE_SECONDS)
+        with using_shard(shard):
+            if shard == DEFAULT_SHARD:
+                yield shard
+            else:
+                with transaction.atomic(using=shard):
+                    yield shard
+
+
+def stale_shard(db, shard):
+    """
+    True when rows read from alias ``db`` come from a shard other than
+    ``shard`` (what user_atomic yields), i.e. were read before their owner was
+    moved; the rows have new ids on the new shard.
+    """
+    if not settings.DATABASE_SHARDS or db is None:
+        return False
+    return (db if db in settings.DATABASE_SHARDS else DEFAULT_SHARD) != shard
+
+
+def _instance_user_id(instance):
+    """Owner of a User, a per-user row or a cell whose calendar is already loaded."""
+    if instance._meta.label == settings.AUTH_USER_MODEL:
+        return instance.pk
+    if hasattr(instance, "user_id"):
+        return instance.user_id
+    calendar = instance._state.fields_cache.get("calendar")
+    return calendar.user_id if calendar is not None else None
+
+
+# ---------- SHARD ROUTER --------------------------------------------------------------
+class ShardRouter:
+    """
+    Route the per-user models to the shard of the user being served: the
+    instance's owner when Django passes one, else the shard pinned by
+    ShardRoutingMiddleware, the job worker or ``using_shard()``. Returning None
+    for 'default' leaves those reads to PrimaryReplicaRouter.
+    """
+
+    def _shard(self, model, instance=None):
+        if not settings.DATABASE_SHARDS or model._meta.model_name not in SHARDED_MODELS:
+            return None
+        shard = None
+        if instance is not None:
+            if instance._meta.model_name in SHARDED_MODELS and instance._state.db:
+                # Rows read from the replica belong to 'default'.
+                db = instance._state.db
+                shard = db if db in settings.DATABASE_SHARDS else DEFAULT_SHARD
+            else:
+                user_id = _instance_user_id(instance)
+                if user_id is not None:
+                    shard = shard_for_user(user_id)
+        shard = shard or _current_shard.get()
+        return shard if shard and shard != DEFAULT_SHARD else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints.get("instance"))
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints.get("instance"))
@@ -0,0 +1,214 @@
+"""
+Per-user server-sent events for calendar cells and bills.
+
+Writers call ``publish()``; after the surrounding transaction commits the
+message goes to the configured backend, which fans it out to the open
+streams of that user. Streams are served by ``sse_app``, a plain ASGI
+coroutine mounted in backend/asgi.py, so an idle subscriber costs one
+asyncio task and a small queue rather than a worker thread.
+
+Streams need an ASGI server: the Procfile runs gunicorn with uvicorn workers.
+InProcessBackend only reaches streams held by the publishing process, which
+is enough with JOBS_EAGER. Otherwise cells are published by the job worker,
+so EVENTS_BACKEND defaults to PostgresNotifyBackend on PostgreSQL and relays
+through LISTEN/NOTIFY.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+# Rows per ``cells`` event; keeps each message well inside pg_notify's payload limit.
+CELLS_PER_EVENT = 100
+
+
+# ---------- BACKENDS ------------------------------------------------------------------
+class InProcessBackend:
+    """Fan-out to the streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id, loop, queue):
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((loop, queue))
+
+    def unsubscribe(self, user_id, loop, queue):
+        with self._lock:
+            streams = self._subscribers.get(user_id, set())
+            streams.discard((loop, queue))
+            if not streams:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_id, message):
+        self._dispatch(user_id, message)
+
+    def _dispatch(self, user_id, message):
+        with self._lock:
+            streams = list(self._subscribers.get(user_id, ()))
+        for loop, queue in streams:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+
+class PostgresNotifyBackend(InProcessBackend):
+    """Relay messages between processes through PostgreSQL LISTEN/NOTIFY."""
+
+    channel = 'pennypal_events'
+    max_payload = 7900  # bytes; PostgreSQL rejects NOTIFY payloads of 8000 or more
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, user_id, loop, queue):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, daemon=True)
+                self._listener.start()
+        super().subscribe(user_id, loop, queue)
+
+    def publish(self, user_id, message):
+        payload = json.dumps([user_id, message])
+        size = len(payload.encode())
+        if size > self.max_payload:
+            # Runs after commit, so raising would fail a request whose write already succeeded.
+            logger.warning("Event of %d bytes is too large to NOTIFY; only local streams get it", size)
+            self._dispatch(user_id, message)
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def _listen(self):
+        import psycopg2
+
+        params = connection.get_connection_params()
+        params.pop('cursor_factory', None)
+        conn = psycopg2.connect(**params)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        conn.cursor().execute(f"LISTEN {self.channel}")
+        while True:
+            if select.select([conn], [], [], KEEPALIVE_SECONDS) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                user_id, message = json.loads(conn.notifies.pop(0).payload)
+                self._dispatch(user_id, message)
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        logger.warning("Dropping event for a stream that is not keeping up")
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.EVENTS_BACKEND)()
+    return _backend
+
+
+# ---------- PUBLISHING ----------------------------------------------------------------
+def publish(user_id, event, data):
+    """Send ``event`` to the user's streams once the current transaction commits."""
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    message = f"event: {event}\ndata: {payload}\n\n"
+    transaction.on_commit(lambda: get_backend().publish(user_id, message))
+
+
+def publish_cells(user_id, cells):
+    """``cells`` events of ``[date, income, expenses, net]`` rows, CELLS_PER_EVENT rows each."""
+    rows = [[cell.date, cell.total_income, cell.total_expenses, cell.net_balance] for cell in cells]
+    for offset in range(0, len(rows), CELLS_PER_EVENT):
+        publish(user_id, 'cells', rows[offset:offset + CELLS_PER_EVENT])
+
+
+# ---------- ASGI STREAM ---------------------------------------------------------------
+async def _authenticate(scope):
+    from rest_framework.authtoken.models import Token
+
+    key = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    if key is None:
+        auth = dict(scope.get('headers', [])).get(b'authorization', b'').decode()
+        if auth.startswith('Token '):
+            key = auth[len('Token '):]
+    if not key:
+        return None
+    token = await Token.objects.select_related('user').filter(key=key).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user_id
+
+
+def _cors_headers(scope):
+    origin = dict(scope.get('headers', [])).get(b'origin')
+    if origin and origin.decode() in settings.CORS_ALLOWED_ORIGINS:
+        return [(b'access-control-allow-origin', origin), (b'vary', b'origin')]
+    return []
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def sse_app(scope, receive, send):
+    """Stream a user's events; authenticate with ``?token=`` or an Authorization header."""
+    user_id = await _authenticate(scope)
+    if user_id is None:
+        await send({'type': 'http.response.start', 'status': 401,
+                    'headers': [(b'content-type', b'application/json')] + _cors_headers(scope)})
+        await send({'type': 'http.response.body', 'body': b'{"detail":"Invalid token."}'})
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    backend = get_backend()
+    backend.subscribe(user_id, loop, queue)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ] + _cors_headers(scope),
+        })
+        await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+        while True:
+            message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {message, disconnected}, timeout=KEEPALIVE_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnected in done:
+                message.cancel()
+                break
+            if message in done:
+                body = message.result()
+            else:
+                message.cancel()
+                body = ': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+    finally:
+        disconnected.cancel()
+        backend.unsubscribe(user_id, loop, queue)
@@ -0,0 +1,85 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django import forms
+from django.core import exceptions, validators
+from django.db import models
+from django.db.models import ExpressionWrapper
+
+
+CENTS = Decimal('0.01')
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    A money amount stored as integer minor units (cents).
+
+    Python code, forms and the API see a 2-place Decimal exactly like the old
+    DecimalField(max_digits=10, decimal_places=2); only the column is an
+    integer, so the database sums integers instead of numerics.
+    """
+    description = "Money amount stored as integer cents"
+    default_error_messages = {
+        'invalid': '“%(value)s” value must be a decimal number.',
+    }
+    max_digits = 10
+    decimal_places = 2
+
+    @property
+    def validators(self):
+        return [
+            *self._validators,
+            validators.DecimalValidator(self.max_digits, self.decimal_places),
+        ]
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Decimal(value).scaleb(-2)  # exact, already 2 places
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENTS)
+        except (InvalidOperation, ValueError):
+            raise exceptions.ValidationError(
+                self.error_messages['invalid'], code='invalid', params={'value': value}
+            )
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None:
+            return value
+        cents = Decimal(str(value)) * 100
+        return int(cents.to_integral_value(rounding=ROUND_HALF_UP))
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': self.decimal_places,
+            **kwargs,
+        })
+
+
+# ---------- INTEGER CENTS -------------------------------------------------------------
+def in_cents(expression):
+    """
+    ``expression`` over MoneyFields (a column, a Sum of one) read back as
+    integer cents, skipping the Decimal conversion.
+    """
+    return ExpressionWrapper(expression, output_field=models.BigIntegerField())
+
+
+def cents_json(cents):
+    """
+    Integer cents as the JSON number the equivalent 2-place Decimal renders as
+    (DRF's encoder writes Decimals as floats), or 0 for an empty aggregate.
+    """
+    return 0 if cents is None else cents / 100
+
+
+def add_cents(*values):
+    """Sum of the non-None ``values``, or None when all are None (an empty aggregate)."""
+    present = [value for value in values if value is not None]
+    return sum(present) if present else None
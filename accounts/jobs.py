@@ -0,0 +1,187 @@
+"""
+Database-backed background jobs.
+
+Work is queued per (kind, user, date range). Enqueuing a range that overlaps
+or touches a pending job of the same kind widens that job instead of adding a
+row, and the worker merges adjacent pending jobs into one run, so a burst of
+edits to the same days collapses into a single recompute.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Least, Greatest
+from django.utils import timezone
+
+from accounts.cells import recompute_cells
+from accounts.db_routers import user_shard
+from accounts.models import Job
+from accounts.purge import purge_user
+from accounts.sharding import drop_moved_rows
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(kind):
+    """Register the function that runs jobs of ``kind``."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def _run(kind, user_id, start, end):
+    """Run a handler with the per-user models routed to the user's shard."""
+    with user_shard(user_id):
+        HANDLERS[kind](user_id, start, end)
+
+
+# ---------- ENQUEUE -------------------------------------------------------------------
+def enqueue(kind, user_id, start=None, end=None, delay=None):
+    """
+    Queue ``kind`` for a user and date range, or run it after commit in eager
+    mode. ``delay`` (seconds) holds the job back; delayed jobs are queued for
+    the worker even in eager mode. Enqueuing over a pending undated job with
+    a later run time pushes that job back to it.
+    """
+    if settings.JOBS_EAGER and not delay:
+        transaction.on_commit(lambda: _run(kind, user_id, start, end))
+        return
+
+    run_after = timezone.now() + timedelta(seconds=delay or 0)
+    pending = Job.objects.filter(kind=kind, user_id=user_id, status='pending')
+    if start is None:
+        undated = pending.filter(start_date__isnull=True)
+        if undated.exists():
+            undated.filter(run_after__lt=run_after).update(run_after=run_after)
+            return
+    else:
+        one_day = timedelta(days=1)
+        widened = pending.filter(
+            start_date__lte=end + one_day,
+            end_date__gte=start - one_day,
+        ).order_by('id')[:1]
+        # Update through a pk subquery so a job a worker claimed meanwhile is left alone.
+        if Job.objects.filter(pk__in=widened, status='pending').update(
+            start_date=Least(F('start_date'), start),
+            end_date=Greatest(F('end_date'), end),
+        ):
+            return
+
+    Job.objects.create(kind=kind, user_id=user_id, start_date=start, end_date=end, run_after=run_after)
+
+
+# ---------- WORKER --------------------------------------------------------------------
+def _merge_adjacent(job, siblings):
+    """Return the jobs whose ranges chain onto ``job``'s range, and the merged range."""
+    if job.start_date is None:
+        return [job] + [s for s in siblings if s.start_date is None], None, None
+
+    batch, start, end = [job], job.start_date, job.end_date
+    one_day = timedelta(days=1)
+    remaining = [s for s in siblings if s.start_date is not None]
+    grew = True
+    while grew:
+        grew = False
+        for sibling in list(remaining):
+            if sibling.start_date <= end + one_day and sibling.end_date >= start - one_day:
+                batch.append(sibling)
+                remaining.remove(sibling)
+                start = min(start, sibling.start_date)
+                end = max(end, sibling.end_date)
+                grew = True
+    return batch, start, end
+
+
+def claim_batch():
+    """Lock the next runnable job plus its mergeable siblings and mark them running."""
+    now = timezone.now()
+    with transaction.atomic():
+        runnable = (
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', run_after__lte=now)
+        )
+        job = runnable.order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        siblings = list(runnable.filter(kind=job.kind, user_id=job.user_id).exclude(pk=job.pk))
+        batch, start, end = _merge_adjacent(job, siblings)
+        ids = [j.pk for j in batch]
+        Job.objects.filter(pk__in=ids).update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        )
+    return job.kind, job.user_id, start, end, ids
+
+
+def run_batch(kind, user_id, start, end, ids):
+    """Run one claimed batch; delete it on success, reschedule or fail it on error."""
+    try:
+        _run(kind, user_id, start, end)
+    except Exception:
+        logger.exception("Job %s for user %s failed", kind, user_id)
+        error = traceback.format_exc()
+        for job in Job.objects.filter(pk__in=ids):
+            job.last_error = error
+            job.locked_at = None
+            if job.attempts >= settings.JOBS_MAX_ATTEMPTS:
+                job.status = 'failed'
+            else:
+                job.status = 'pending'
+                delay = settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+                job.run_after = timezone.now() + timedelta(seconds=delay)
+            job.save(update_fields=['last_error', 'locked_at', 'status', 'run_after'])
+        return False
+
+    Job.objects.filter(pk__in=ids).delete()
+    return True
+
+
+def release_stale():
+    """Put back jobs whose worker died mid-run."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='pending', locked_at=None
+    )
+
+
+def run_pending(limit=None):
+    """Run queued jobs until the queue is empty or ``limit`` batches have run."""
+    done = 0
+    while limit is None or done < limit:
+        claimed = claim_batch()
+        if claimed is None:
+            break
+        run_batch(*claimed)
+        done += 1
+    return done
+
+
+# ---------- HANDLERS ------------------------------------------------------------------
+@handler('recompute_cells')
+def _recompute_cells(user_id, start, end):
+    recompute_cells(user_id, start, end)
+
+
+@handler('provision_calendar')
+def _provision_calendar(user_id, start, end):
+    recompute_cells(user_id, start, end, fill=True)
+
+
+@handler('drop_moved_rows')
+def _drop_moved_rows(user_id, start, end):
+    wait = drop_moved_rows(user_id)
+    if wait:
+        enqueue('drop_moved_rows', user_id, delay=wait)
+
+
+@handler('purge_user')
+def _purge_user(user_id, start, end):
+    # Deletes this job's own row along with the user's; run_batch's cleanup is then a no-op.
+    purge_user(user_id)
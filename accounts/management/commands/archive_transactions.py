@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models.functions import ExtractYear
+
+from accounts.archive import archive_year
+from accounts.db_routers import shard_aliases, using_shard
+from accounts.models import Transaction
+
+
+class Command(BaseCommand):
+    help = "Move transactions of whole years past the archive horizon into compressed per-user archives."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--before-year", type=int,
+            help="Archive years before this one (default: TRANSACTION_ARCHIVE_AFTER_YEARS before today).",
+        )
+        parser.add_argument("--user", type=int, action="append", help="Only archive this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        before = options["before_year"] or date.today().year - settings.TRANSACTION_ARCHIVE_AFTER_YEARS
+        archived = 0
+        for shard in shard_aliases():
+            with using_shard(shard):
+                pending = (
+                    Transaction.objects
+                    .filter(date__lt=date(before, 1, 1))
+                    .annotate(year=ExtractYear("date"))
+                    .values_list("user_id", "year")
+                    .distinct()
+                    .order_by("user_id", "year")
+                )
+                if options["user"]:
+                    pending = pending.filter(user_id__in=options["user"])
+
+                for user_id, year in list(pending):
+                    count = archive_year(user_id, year)
+                    archived += count
+                    self.stdout.write(f"User {user_id}, {year}: archived {count} transaction(s).")
+        self.stdout.write(f"Archived {archived} transaction(s) dated before {before}.")
@@ -0,0 +1,98 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+
+# A fresh interpreter per round: load the ASGI app the way the Procfile's
+# uvicorn worker does, then time the first and second request through it.
+ROUND_SCRIPT = """
+import asyncio, json, sys, time
+path, _, query = sys.argv[1].partition("?")
+token = sys.argv[2]
+
+async def request():
+    headers = [(b"host", b"localhost")]
+    if token:
+        headers.append((b"authorization", ("Token " + token).encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    body = [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        if body:
+            return body.pop()
+        await asyncio.Future()  # the client never disconnects
+
+    async def send(message):
+        sent.append(message)
+
+    started = time.perf_counter()
+    await application(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    size = sum(len(m.get("body", b"")) for m in sent if m["type"] == "http.response.body")
+    return elapsed, status, size
+
+async def main():
+    first, status, size = await request()
+    second, _, _ = await request()
+    return first, second, status, size
+
+started = time.perf_counter()
+from backend.asgi import application
+boot = time.perf_counter() - started
+first, second, status, size = asyncio.run(main())
+print(json.dumps({"boot": boot, "first": first, "second": second, "status": status, "bytes": size}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure time-to-first-response of a freshly started worker, with and without warm-up."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/api/categories/", help="Request path to time.")
+        parser.add_argument("--user", help="Username to authenticate as (a token is created if needed).")
+        parser.add_argument("--rounds", type=int, default=5, help="Fresh processes per mode.")
+
+    def _round(self, warm, path, token):
+        env = {**os.environ, "WARM_UP_ON_START": "true" if warm else "false"}
+        result = subprocess.run(
+            [sys.executable, "-c", ROUND_SCRIPT, path, token],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr else "Round failed.")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        token = ""
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}.")
+            token = Token.objects.get_or_create(user=user)[0].key
+
+        self.stdout.write(f"GET {options['path']}, median of {options['rounds']} fresh processes:")
+        self.stdout.write(f"  {'':<10} {'boot':>9} {'1st req':>9} {'TTFR':>9} {'2nd req':>9}  status")
+        for label, warm in (("cold", False), ("warmed", True)):
+            rounds = [self._round(warm, options["path"], token) for _ in range(options["rounds"])]
+            boot = statistics.median(r["boot"] for r in rounds)
+            first = statistics.median(r["first"] for r in rounds)
+            ttfr = statistics.median(r["boot"] + r["first"] for r in rounds)
+            second = statistics.median(r["second"] for r in rounds)
+            self.stdout.write(
+                f"  {label:<10} {boot * 1000:7.1f}ms {first * 1000:7.1f}ms "
+                f"{ttfr * 1000:7.1f}ms {second * 1000:7.1f}ms  {rounds[0]['status']}"
+            )
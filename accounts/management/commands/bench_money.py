@@ -0,0 +1,102 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, Sum
+from django.db.models.functions import Cast
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from accounts.cells import recompute_cells
+from accounts.db_routers import replica_configured
+from accounts.models import BillDue, Transaction
+
+
+YEARS = 10
+FIRST_DAY = date(2015, 1, 1)
+# The money-heavy endpoints, as the frontend calls them.
+ENDPOINTS = [
+    ("monthly summary", "/api/summary/monthly/"),
+    ("annual summary", "/api/summary/annual/?year=2020"),
+    ("monthly pie data", "/api/monthly-pie-data/?year=2020"),
+    ("total expenses", "/api/transactions/total-expenses/"),
+    ("trends", "/api/summary/trends/?start=2016-01&end=2024-12"),
+    ("calendar, compact", "/api/calendar/?format=compact"),
+    ("calendar", "/api/calendar/"),
+]
+
+
+def _best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Time the money endpoints end to end, and integer-cent against numeric SUMs, on synthetic rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if replica_configured():
+            # The rows are never committed, so a replica would not see them.
+            raise CommandError("Run without DATABASE_REPLICA_URL.")
+        rows, repeat = options["rows"], options["repeat"]
+        rng = random.Random(42)
+        days = (date(FIRST_DAY.year + YEARS, 1, 1) - FIRST_DAY).days
+
+        with transaction.atomic():
+            user = User.objects.create(username=f"bench-money-{time.time_ns()}")
+            Transaction.objects.bulk_create(
+                (
+                    Transaction(
+                        user=user,
+                        amount=Decimal(rng.randint(1, 500_000)) / 100,
+                        type=rng.choice(("income", "expense")),
+                        date=FIRST_DAY + timedelta(days=rng.randrange(days)),
+                    )
+                    for _ in range(rows)
+                ),
+                batch_size=5000,
+            )
+            BillDue.objects.bulk_create(
+                BillDue(
+                    user=user, name=f"Bill {n}", amount=Decimal(rng.randint(1, 50_000)) / 100,
+                    type="Bill", due_date=FIRST_DAY + timedelta(days=rng.randrange(days)),
+                )
+                for n in range(rows // 100)
+            )
+            recompute_cells(user.id, FIRST_DAY, FIRST_DAY + timedelta(days=days - 1))
+            qs = Transaction.objects.filter(user=user)
+
+            results = [
+                ("DB SUM, integer cents", _best_of(repeat, lambda: qs.aggregate(total=Sum("amount"))), None),
+                # Same rows summed as numeric, i.e. what the old DecimalField columns cost.
+                ("DB SUM, numeric", _best_of(repeat, lambda: qs.aggregate(
+                    total=Sum(Cast("amount", DecimalField(max_digits=12, decimal_places=2)))
+                )), None),
+            ]
+
+            client = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+            with override_settings(THROTTLE_CAPACITY=0):
+                for label, path in ENDPOINTS:
+                    response = client.get(path)
+                    if response.status_code != 200:
+                        raise CommandError(f"GET {path} returned {response.status_code}.")
+                    results.append((f"GET {label}", _best_of(repeat, lambda: client.get(path)), len(response.content)))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{rows} rows over {YEARS} years, best of {repeat}:")
+        for label, seconds, size in results:
+            self.stdout.write(f"  {label:<26} {seconds * 1000:9.2f} ms" + (f"  {size:>9} bytes" if size else ""))
@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from accounts.cells import audit_shard_range
+from accounts.db_routers import shard_aliases
+from accounts.parallel import process_pool, id_ranges
+
+
+class Command(BaseCommand):
+    help = "Compare CalendarCell totals against Transaction aggregates and optionally repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only check this user id (repeatable).")
+        parser.add_argument("--repair", action="store_true", help="Rewrite drifted and missing cells.")
+        parser.add_argument("--workers", type=int, default=1, help="Processes to split the user-id space across.")
+        parser.add_argument("--chunk-size", type=int, default=500, help="User ids per unit of work.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        repair = options["repair"]
+
+        if options["users"]:
+            ranges = [(user_id, user_id) for user_id in sorted(set(options["users"]))]
+        else:
+            bounds = User.objects.aggregate(first=Min("id"), last=Max("id"))
+            if bounds["first"] is None:
+                self.stdout.write("No users.")
+                return
+            ranges = list(id_ranges(bounds["first"], bounds["last"], options["chunk_size"]))
+
+        # Every shard is checked for every range; users only have rows on one of them.
+        tasks = [(shard, lo, hi, repair) for shard in shard_aliases() for lo, hi in ranges]
+        if options["workers"] > 1 and len(tasks) > 1:
+            with process_pool(options["workers"]) as pool:
+                results = list(pool.map(audit_shard_range, *zip(*tasks)))
+        else:
+            results = [audit_shard_range(*task) for task in tasks]
+
+        totals = {key: sum(r[key] for r in results) for key in ("users", "cells", "drifted", "missing", "repaired", "total_drift")}
+        max_drift = max(r["max_drift"] for r in results)
+
+        self.stdout.write(
+            f"Checked {totals['cells']} cells for {totals['users']} users "
+            f"in {time.monotonic() - started:.1f}s."
+        )
+        self.stdout.write(
+            f"Drifted: {totals['drifted']}  Missing: {totals['missing']}  "
+            f"Net drift: {totals['total_drift']} (max {max_drift})"
+        )
+        if repair:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {totals['repaired']} cells."))
+        elif totals["drifted"] or totals["missing"]:
+            self.stdout.write(self.style.WARNING("Run again with --repair to fix."))
@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from accounts.anomalies import detect_range
+from accounts.db_routers import shard_aliases
+from accounts.models import SpendingAnomaly
+from accounts.parallel import process_pool, id_ranges
+
+
+class Command(BaseCommand):
+    help = "Flag spending spikes, unusually large transactions and late bills for every user (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users", help="Only this user id (repeatable).")
+        parser.add_argument("--workers", type=int, default=1, help="Processes to split the user-id space across.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="User ids per unit of work.")
+        parser.add_argument("--today", type=date.fromisoformat, default=None, metavar="YYYY-MM-DD",
+                            help="Run as of this date instead of today.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        if options["users"]:
+            ranges = [(user_id, user_id) for user_id in sorted(set(options["users"]))]
+        else:
+            bounds = User.objects.aggregate(first=Min("id"), last=Max("id"))
+            if bounds["first"] is None:
+                self.stdout.write("No users.")
+                return
+            ranges = list(id_ranges(bounds["first"], bounds["last"], options["chunk_size"]))
+
+        tasks = [(shard, lo, hi, options["today"]) for shard in shard_aliases() for lo, hi in ranges]
+        if options["workers"] > 1 and len(tasks) > 1:
+            with process_pool(options["workers"]) as pool:
+                results = list(pool.map(detect_range, *zip(*tasks)))
+        else:
+            results = [detect_range(*task) for task in tasks]
+
+        self.stdout.write(f"Scanned {len(ranges)} user range(s) in {time.monotonic() - started:.1f}s.")
+        for kind, label in SpendingAnomaly.KIND_CHOICES:
+            self.stdout.write(f"{label}: {sum(result[kind] for result in results)}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.db_routers import shard_aliases, shard_for_user
+from accounts.sharding import move_user
+
+
+class Command(BaseCommand):
+    help = "Move users' transactions, categories, bills and calendars to another shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument("users", type=int, nargs="+", help="User ids to move.")
+        parser.add_argument("--to", required=True, dest="target", help="Target shard alias.")
+
+    def handle(self, *args, **options):
+        target = options["target"]
+        if target not in shard_aliases():
+            raise CommandError(f"Unknown shard {target!r}; choose from {', '.join(shard_aliases())}.")
+
+        for user_id in options["users"]:
+            source = shard_for_user(user_id)
+            moved = move_user(user_id, target)
+            if not moved:
+                self.stdout.write(f"User {user_id} is already on {target}.")
+                continue
+            counts = ", ".join(f"{count} {name}" for name, count in moved.items())
+            self.stdout.write(f"User {user_id}: {source} -> {target} ({counts}).")
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (calendar recomputes, provisioning, maintenance)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            released = jobs.release_stale()
+            if released:
+                self.stdout.write(f"Released {released} stale job(s).")
+
+            done = jobs.run_pending(limit=100)
+            if done:
+                self.stdout.write(f"Ran {done} batch(es).")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["sleep"])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+
+from accounts.models import CalendarCell, Transaction
+from accounts.sharding import fan_out
+
+
+def _shard_stats():
+    stats = Transaction.objects.aggregate(
+        users=Count("user_id", distinct=True),
+        transactions=Count("id"),
+        income=Sum("amount", filter=Q(type="income")),
+        expenses=Sum("amount", filter=Q(type="expense")),
+    )
+    stats["cells"] = CalendarCell.objects.count()
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Per-shard users, transactions, totals and cells, queried on all shards in parallel."
+
+    def handle(self, *args, **options):
+        results = fan_out(_shard_stats)
+        columns = ("users", "transactions", "income", "expenses", "cells")
+        self.stdout.write(f"{'shard':<10}" + "".join(f"{name:>16}" for name in columns))
+        for alias, stats in results.items():
+            self.stdout.write(f"{alias:<10}" + "".join(f"{stats[name] or 0:>16}" for name in columns))
+        totals = {name: sum(stats[name] or 0 for stats in results.values()) for name in columns}
+        self.stdout.write(f"{'total':<10}" + "".join(f"{totals[name]:>16}" for name in columns))
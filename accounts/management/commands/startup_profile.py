@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter so nothing is imported yet; -X importtime reports to stderr.
+PROFILE_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import backend.asgi
+loaded = time.perf_counter() - started
+from accounts.warmup import warm_up
+print(json.dumps({"load": loaded, "warm_up": warm_up()}))
+"""
+
+
+def _parse_importtime(stderr):
+    """``[(module, self_us, cumulative_us), ...]`` from ``-X importtime`` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(own), int(cumulative)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Show what a cold worker spends its startup on: imports by package and module, then each warm-up step."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Rows to show per table.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "WARM_UP_ON_START": "false"}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROFILE_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr else "Profiling failed.")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = _parse_importtime(result.stderr)
+        top = options["top"]
+
+        by_package = defaultdict(int)
+        for name, own, _ in modules:
+            by_package[name.split(".")[0]] += own
+        total = sum(by_package.values())
+
+        self.stdout.write(f"Loading backend.asgi: {report['load'] * 1000:.0f} ms "
+                          f"({len(modules)} modules, {total / 1000:.0f} ms importing)")
+        self.stdout.write("\nImport time by package (self):")
+        for package, own in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {package:<32} {own / 1000:8.1f} ms  {own * 100 / total:5.1f}%")
+
+        self.stdout.write("\nSlowest modules (cumulative):")
+        for name, _, cumulative in sorted(modules, key=lambda module: -module[2])[:top]:
+            self.stdout.write(f"  {name:<48} {cumulative / 1000:8.1f} ms")
+
+        self.stdout.write("\nWarm-up steps:")
+        for name, count, seconds in report["warm_up"]:
+            self.stdout.write(f"  {name:<12} {count:5}  {seconds * 1000:8.1f} ms")
@@ -0,0 +1,88 @@
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+
+from accounts.cells import recompute_cells
+from accounts.db_routers import user_shard
+from accounts.models import CalendarCell, Transaction
+from accounts.purge import purge_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Write transactions for one user and day from many threads, recomputing the "
+        "day's cell after each write, then check the cell totals and report throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=50, help="Transactions per thread.")
+        parser.add_argument("--day", type=date.fromisoformat, default=date.today(), metavar="YYYY-MM-DD")
+        parser.add_argument("--keep", action="store_true", help="Keep the stress user and its rows.")
+
+    def handle(self, *args, **options):
+        day, writes = options["day"], options["writes"]
+        user = User.objects.create(username=f"stress-cells-{time.time_ns()}")
+        errors = []
+
+        def worker(number):
+            try:
+                with user_shard(user.id):
+                    for i in range(writes):
+                        Transaction.objects.create(
+                            user=user,
+                            type="income" if i % 3 == 0 else "expense",
+                            amount=Decimal(number * writes + i + 1) / 100,
+                            description=f"stress {number}/{i}",
+                            date=day,
+                        )
+                        recompute_cells(user.id, day, day)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options["threads"])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            with user_shard(user.id):
+                rows = Transaction.objects.filter(user=user, date=day)
+                income = rows.filter(type="income").aggregate(total=Sum("amount"))["total"] or 0
+                expenses = rows.filter(type="expense").aggregate(total=Sum("amount"))["total"] or 0
+                cells = list(CalendarCell.objects.filter(calendar__user=user, date=day))
+                count = rows.count()
+        finally:
+            if not options["keep"]:
+                purge_user(user.id)
+
+        self.stdout.write(
+            f"{count} writes from {len(threads)} threads in {elapsed:.2f}s "
+            f"({count / elapsed:.0f} writes/s), {len(errors)} failed."
+        )
+        for exc in errors[:5]:
+            self.stderr.write(f"  {type(exc).__name__}: {exc}")
+        if errors or count != len(threads) * writes:
+            raise CommandError(
+                f"Only {count} of {len(threads) * writes} writes succeeded; {len(errors)} thread(s) failed."
+            )
+        if len(cells) != 1:
+            raise CommandError(f"Expected one cell for {day}, found {len(cells)}.")
+        cell = cells[0]
+        if (cell.total_income, cell.total_expenses, cell.net_balance) != (income, expenses, income - expenses):
+            raise CommandError(
+                f"Cell totals {cell.total_income}/{cell.total_expenses}/{cell.net_balance} "
+                f"do not match transactions {income}/{expenses}/{income - expenses}."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Cell for {day} matches: {income} in, {expenses} out."))
@@ -0,0 +1,83 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+TABLE = "accounts_transaction"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def _partition_name(year):
+    return f"{TABLE}_y{year}"
+
+
+class Command(BaseCommand):
+    help = "Create upcoming yearly partitions of the transaction table and detach old ones (PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, default=1, help="Years after the current one to create partitions for.")
+        parser.add_argument("--detach-before", type=int, metavar="YEAR", help="Detach partitions for years before YEAR.")
+        parser.add_argument("--archive-schema", metavar="SCHEMA", help="Move detached partitions into SCHEMA.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Database (shard) to maintain.")
+
+    def handle(self, *args, **options):
+        self.connection = connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            raise CommandError("Transaction partitioning is only available on PostgreSQL.")
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass", [TABLE]
+            )
+            if cursor.fetchone() is None:
+                raise CommandError(f"{TABLE} is not partitioned; run migrations first.")
+
+            existing = self._partitions(cursor)
+            this_year = date.today().year
+            for year in range(this_year, this_year + options["ahead"] + 1):
+                if _partition_name(year) not in existing:
+                    self._create(cursor, year)
+                    self.stdout.write(f"Created {_partition_name(year)}.")
+
+            if options["detach_before"] is not None:
+                if options["archive_schema"]:
+                    cursor.execute(
+                        f"CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(options['archive_schema'])}"
+                    )
+                for name in sorted(existing):
+                    if name == DEFAULT_PARTITION or int(name.rsplit("_y", 1)[1]) >= options["detach_before"]:
+                        continue
+                    self._detach(cursor, name, options["archive_schema"])
+
+    def _partitions(self, cursor):
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [TABLE],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def _create(self, cursor, year):
+        # A new range cannot be attached while the default partition holds rows
+        # for it, so build the partition standalone, move those rows, then attach.
+        name = _partition_name(year)
+        bounds = f"FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        with transaction.atomic(using=self.connection.alias):
+            cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                f"WHERE date >= %s AND date < %s RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved",
+                [date(year, 1, 1), date(year + 1, 1, 1)],
+            )
+            cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}")
+
+    def _detach(self, cursor, name, schema):
+        cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+        if schema:
+            cursor.execute(f"ALTER TABLE {name} SET SCHEMA {self.connection.ops.quote_name(schema)}")
+            self.stdout.write(f"Detached {name} into {schema}.")
+        else:
+            self.stdout.write(f"Detached {name}.")
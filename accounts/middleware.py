@@ -0,0 +1,111 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.db_routers import DEFAULT_SHARD, _read_from_replica, shard_for_user, using_shard
+
+
+# Read-only endpoints whose GETs may be answered from the replica.
+REPLICA_READ_VIEWS = {
+    "total-expenses",
+    "monthly-summary",
+    "annual-summary",
+    "trends",
+    "monthly-pie-data",
+    "day-view",
+    "calendar-range",
+    "calendar-list-create",
+    "category-list-create",
+    "transaction-list-create",
+    "bills-list-create",
+}
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _sticky_key(request):
+    """Cache key identifying the caller; API tokens map one-to-one to users."""
+    auth = request.META.get("HTTP_AUTHORIZATION")
+    if not auth:
+        return None
+    digest = hashlib.sha1(auth.encode()).hexdigest()
+    return f"replica-pin:{digest}"
+
+
+# ---------- REPLICA ROUTING -----------------------------------------------------------
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests to REPLICA_READ_VIEWS read from the replica, unless the
+    same caller wrote something within the last REPLICA_STICKY_SECONDS, in which
+    case they stay pinned to the primary so they can read their own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _read_from_replica.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            key = _sticky_key(request)
+            if key:
+                cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS:
+            return None
+        match = request.resolver_match
+        if match is None or match.url_name not in REPLICA_READ_VIEWS:
+            return None
+        key = _sticky_key(request)
+        if key and cache.get(key):
+            return None
+        _read_from_replica.set(True)
+        return None
+
+
+# ---------- SHARD ROUTING -------------------------------------------------------------
+TOKEN_USER_SECONDS = 300
+
+
+def _token_user_id(request):
+    """User id behind an ``Authorization: Token ...`` header, cached by token hash."""
+    from rest_framework.authtoken.models import Token
+
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth.startswith("Token "):
+        return None
+    key = auth[len("Token "):].strip()
+    cache_key = f"token-user:{hashlib.sha1(key.encode()).hexdigest()}"
+    user_id = cache.get(cache_key)
+    if user_id is None:
+        user_id = Token.objects.filter(key=key).values_list("user_id", flat=True).first()
+        if user_id is not None:
+            cache.set(cache_key, user_id, TOKEN_USER_SECONDS)
+    return user_id
+
+
+class ShardRoutingMiddleware:
+    """
+    Pin the per-user models to the shard of the token's owner for the whole
+    request. DRF authenticates inside the view, so the token is resolved here.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_SHARDS:
+            return self.get_response(request)
+        user_id = _token_user_id(request)
+        # Writes skip the cache so they never go to a shard the user was just moved off.
+        fresh = request.method not in SAFE_METHODS
+        shard = shard_for_user(user_id, fresh=fresh) if user_id is not None else DEFAULT_SHARD
+        with using_shard(shard):
+            return self.get_response(request)
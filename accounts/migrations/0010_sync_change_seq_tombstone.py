@@ -0,0 +1,73 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def stamp_existing_rows(apps, schema_editor):
+    """Give pre-existing rows change 1 so the first delta sync (token 0) returns them."""
+    for model_name in ('Profile', 'Category', 'Transaction', 'BillDue'):
+        apps.get_model('accounts', model_name).objects.using(schema_editor.connection.alias).update(change_seq=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('change_seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='billdue',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='change_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='billdue',
+            index=models.Index(fields=['user', 'change_seq'], name='accounts_billdue_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['user', 'change_seq'], name='accounts_category_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'change_seq'], name='accounts_transaction_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_seq'], name='accounts_to_user_id_07e250_idx'),
+        ),
+        migrations.RunPython(stamp_existing_rows, migrations.RunPython.noop),
+    ]
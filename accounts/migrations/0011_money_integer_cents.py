@@ -0,0 +1,55 @@
+# Store money as integer cents instead of numeric(10, 2).
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Round
+
+import accounts.fields
+
+
+MONEY_COLUMNS = [
+    ('transaction', 'amount'),
+    ('billdue', 'amount'),
+    ('calendarcell', 'total_income'),
+    ('calendarcell', 'total_expenses'),
+    ('calendarcell', 'net_balance'),
+]
+
+
+def copy_to_cents(apps, schema_editor):
+    for model_name, field in MONEY_COLUMNS:
+        model = apps.get_model('accounts', model_name)
+        model.objects.using(schema_editor.connection.alias).update(**{f'{field}_cents': Round(F(field) * 100)})
+
+
+def cents_operations():
+    operations = []
+    for model_name, field in MONEY_COLUMNS:
+        operations.append(migrations.AddField(
+            model_name=model_name,
+            name=f'{field}_cents',
+            field=models.BigIntegerField(default=0),
+        ))
+    operations.append(migrations.RunPython(copy_to_cents))
+    for model_name, field in MONEY_COLUMNS:
+        default = {} if field == 'amount' else {'default': 0}
+        operations += [
+            migrations.RemoveField(model_name=model_name, name=field),
+            migrations.RenameField(model_name=model_name, old_name=f'{field}_cents', new_name=field),
+            migrations.AlterField(
+                model_name=model_name,
+                name=field,
+                field=accounts.fields.MoneyField(**default),
+            ),
+        ]
+    return operations
+
+
+class Migration(migrations.Migration):
+    """Forward-only: the copy to cents has no reverse."""
+
+    dependencies = [
+        ('accounts', '0010_sync_change_seq_tombstone'),
+    ]
+
+    operations = cents_operations()
@@ -0,0 +1,70 @@
+# Rebuild accounts_transaction as a table range-partitioned by date (one
+# partition per year plus a default), PostgreSQL only. Other backends keep the
+# plain table. Forward-only.
+
+from datetime import date
+
+from django.db import migrations
+
+
+def partition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT EXTRACT(YEAR FROM MIN(date))::int FROM accounts_transaction")
+        first_year = cursor.fetchone()[0] or date.today().year
+        last_year = date.today().year + 1
+
+        cursor.execute("ALTER TABLE accounts_transaction RENAME TO accounts_transaction_unpartitioned")
+        cursor.execute(
+            "CREATE TABLE accounts_transaction "
+            "(LIKE accounts_transaction_unpartitioned INCLUDING DEFAULTS) "
+            "PARTITION BY RANGE (date)"
+        )
+        for year in range(first_year, last_year + 1):
+            cursor.execute(
+                f"CREATE TABLE accounts_transaction_y{year} PARTITION OF accounts_transaction "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+            )
+        cursor.execute("CREATE TABLE accounts_transaction_default PARTITION OF accounts_transaction DEFAULT")
+
+        cursor.execute("INSERT INTO accounts_transaction SELECT * FROM accounts_transaction_unpartitioned")
+        # Drops the old identity sequence, indexes and constraints, freeing their names.
+        cursor.execute("DROP TABLE accounts_transaction_unpartitioned")
+
+        # Identity columns on partitioned tables need PostgreSQL 17; use an owned sequence.
+        cursor.execute("CREATE SEQUENCE accounts_transaction_id_seq OWNED BY accounts_transaction.id")
+        cursor.execute(
+            "ALTER TABLE accounts_transaction "
+            "ALTER COLUMN id SET DEFAULT nextval('accounts_transaction_id_seq')"
+        )
+        cursor.execute(
+            "SELECT setval('accounts_transaction_id_seq', "
+            "COALESCE((SELECT MAX(id) FROM accounts_transaction), 0) + 1, false)"
+        )
+
+        # Unique constraints on a partitioned table must include the partition key.
+        cursor.execute("ALTER TABLE accounts_transaction ADD PRIMARY KEY (id, date)")
+        cursor.execute(
+            "ALTER TABLE accounts_transaction ADD CONSTRAINT accounts_transaction_user_id_fk "
+            "FOREIGN KEY (user_id) REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(
+            "ALTER TABLE accounts_transaction ADD CONSTRAINT accounts_transaction_category_id_fk "
+            "FOREIGN KEY (category_id) REFERENCES accounts_category (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute("CREATE INDEX accounts_transaction_user_id_idx ON accounts_transaction (user_id)")
+        cursor.execute("CREATE INDEX accounts_transaction_category_id_idx ON accounts_transaction (category_id)")
+        cursor.execute("CREATE INDEX accounts_transaction_sync_idx ON accounts_transaction (user_id, change_seq)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_money_integer_cents'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_transaction_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billdue',
+            index=models.Index(fields=['due_date'], name='accounts_bi_due_dat_b86e77_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarcell',
+            index=models.Index(fields=['date'], name='accounts_ca_date_ea9921_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='accounts_tr_date_4ebe57_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:54
+
+import hashlib
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def transaction_fingerprint(user_id, day, amount, type, description):
+    # Frozen copy of accounts.models.transaction_fingerprint as of this migration.
+    cents = int((Decimal(str(amount)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+    text = ' '.join((description or '').split()).casefold()
+    return hashlib.sha256(f"{user_id}|{day}|{cents}|{type}|{text}".encode()).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Transaction = apps.get_model('accounts', 'Transaction')
+    objects = Transaction.objects.db_manager(schema_editor.connection.alias)
+    batch = []
+    rows = objects.only('user_id', 'date', 'amount', 'type', 'description')
+    for tx in rows.iterator(chunk_size=2000):
+        tx.fingerprint = transaction_fingerprint(tx.user_id, tx.date, tx.amount, tx.type, tx.description)
+        batch.append(tx)
+        if len(batch) == 2000:
+            objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_admin_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'fingerprint'], name='accounts_tr_user_id_3f5612_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'idempotency_key'], name='accounts_tr_user_id_cf8c03_idx'),
+        ),
+    ]
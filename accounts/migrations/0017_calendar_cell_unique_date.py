@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:04
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_cells(apps, schema_editor):
+    """Keep the oldest cell per (calendar, date); `check_calendar_cells --repair` fixes its totals."""
+    CalendarCell = apps.get_model('accounts', 'CalendarCell')
+    cells = CalendarCell.objects.using(schema_editor.connection.alias)
+    duplicated = (
+        cells.values('calendar_id', 'date')
+        .annotate(keep=Min('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    for row in duplicated.iterator():
+        cells.filter(calendar_id=row['calendar_id'], date=row['date']).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_shard_assignment'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_cells, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='calendarcell',
+            constraint=models.UniqueConstraint(fields=('calendar', 'date'), name='unique_calendar_cell_date'),
+        ),
+    ]
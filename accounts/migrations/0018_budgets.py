@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:07
+
+import accounts.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def count_existing_spend(apps, schema_editor):
+    """Fill CategorySpend from the expenses already in the Transaction table."""
+    Transaction = apps.get_model('accounts', 'Transaction')
+    CategorySpend = apps.get_model('accounts', 'CategorySpend')
+    alias = schema_editor.connection.alias
+    rows = (
+        Transaction.objects.using(alias)
+        .filter(type='expense', category__isnull=False)
+        .annotate(month=TruncMonth('date'))
+        .values('user_id', 'category_id', 'month')
+        .annotate(spent=Sum('amount'))
+    )
+    CategorySpend.objects.using(alias).bulk_create(
+        (CategorySpend(user_id=row['user_id'], category_id=row['category_id'], month=row['month'], spent=row['spent'])
+         for row in rows.iterator()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_calendar_cell_unique_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('monthly', 'Monthly'), ('yearly', 'Yearly')], default='monthly', max_length=10)),
+                ('limit', accounts.fields.MoneyField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='accounts.category')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('category', 'period')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BudgetEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('threshold', models.PositiveSmallIntegerField()),
+                ('spent', accounts.fields.MoneyField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='accounts.budget')),
+            ],
+            options={
+                'unique_together': {('budget', 'period_start', 'threshold')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CategorySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('spent', accounts.fields.MoneyField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend', to='accounts.category')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='category_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('category', 'month')},
+            },
+        ),
+        migrations.RunPython(count_existing_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:10
+
+import accounts.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_budgets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billdue',
+            name='paid_on',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SpendingAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('spike', 'Category spending spike'), ('large_transaction', 'Unusually large transaction'), ('late_bill', 'Bill paid late')], max_length=20)),
+                ('date', models.DateField()),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('amount', accounts.fields.MoneyField()),
+                ('baseline', accounts.fields.MoneyField(blank=True, null=True)),
+                ('score', models.FloatField()),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='accounts.category')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='accounts_sp_user_id_befecc_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:52
+
+import gzip
+import json
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+import accounts.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_usage(apps, schema_editor):
+    # Frozen copy of the archive record format (gzipped NDJSON, amounts in cents).
+    alias = schema_editor.connection.alias
+    TransactionArchive = apps.get_model('accounts', 'TransactionArchive')
+    ArchivedCategoryUsage = apps.get_model('accounts', 'ArchivedCategoryUsage')
+    Category = apps.get_model('accounts', 'Category')
+    categories = set(Category.objects.using(alias).values_list('pk', flat=True))
+    archives = TransactionArchive.objects.using(alias).only('user_id', 'year', 'data')
+    for archive in archives.iterator(chunk_size=100):
+        usage = defaultdict(lambda: [0, 0, 0, ''])
+        for line in gzip.decompress(bytes(archive.data)).decode().splitlines():
+            record = json.loads(line)
+            if record['category_id'] in categories:
+                row = usage[record['category_id']]
+                row[0] += 1
+                row[1 if record['type'] == 'income' else 2] += record['amount']
+                row[3] = max(row[3], record['date'])
+        ArchivedCategoryUsage.objects.using(alias).bulk_create([
+            ArchivedCategoryUsage(
+                user_id=archive.user_id,
+                category_id=category_id,
+                year=archive.year,
+                transaction_count=count,
+                income_total=Decimal(income) / 100,
+                expense_total=Decimal(expenses) / 100,
+                last_used=date.fromisoformat(last_used),
+            )
+            for category_id, (count, income, expenses, last_used) in usage.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_spending_anomaly'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCategoryUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('income_total', accounts.fields.MoneyField(default=0)),
+                ('expense_total', accounts.fields.MoneyField(default=0)),
+                ('last_used', models.DateField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_usage', to='accounts.category')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_category_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('category', 'year')},
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,22 @@
+import hashlib
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Sum
+from django.db.models import Sum, F
+from django.utils import timezone
+
+from accounts import events
+from accounts.db_routers import pick_shard, user_atomic
+from accounts.fields import MoneyField
 
 
 # ---------- PROFILE -------------------------------------------------------------------
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    change_seq = models.BigIntegerField(default=0)  # last change token handed out (see SyncedModel)
 
     def __str__(self):
         return self.user.username
@@ -19,25 +27,120 @@ def create_user_profile(sender, instance, created, **kwargs):
     """Automatically create a Profile when a new User is created."""
     if created:
         Profile.objects.create(user=instance)
+        shard = pick_shard(instance.pk)
+        if shard is not None:
+            ShardAssignment.objects.create(user=instance, shard=shard)
+
+
+class ShardAssignment(models.Model):
+    """Database alias holding a user's per-user rows (see accounts.db_routers.ShardRouter)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='shard_assignment')
+    shard = models.CharField(max_length=50)
+    moved_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.user_id} on {self.shard}"
+
+
+# ---------- SYNC ----------------------------------------------------------------------
+def next_change_seq(user_id):
+    """
+    Bump and return the user's change counter. Must run inside the transaction
+    that writes the change: the Profile row lock then keeps sequence order equal
+    to commit order, so a client never skips a row committed late.
+    """
+    if not Profile.objects.filter(user_id=user_id).update(change_seq=F('change_seq') + 1):
+        Profile.objects.get_or_create(user_id=user_id)
+        Profile.objects.filter(user_id=user_id).update(change_seq=F('change_seq') + 1)
+    return Profile.objects.filter(user_id=user_id).values_list('change_seq', flat=True).get()
+
+
+class SyncedModel(models.Model):
+    """
+    Per-user rows that delta sync tracks: every save stamps the next change
+    sequence and every delete leaves a Tombstone. Queryset update(), bulk_create()
+    and cascades bypass this and must stamp change_seq themselves.
+    """
+    change_seq = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=['user', 'change_seq'], name='%(app_label)s_%(class)s_sync_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        with user_atomic(self.user_id):
+            self.change_seq = next_change_seq(self.user_id)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq'}
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with user_atomic(self.user_id):
+            Tombstone.objects.create(
+                user_id=self.user_id,
+                model=self._meta.model_name,
+                object_id=self.pk,
+                change_seq=next_change_seq(self.user_id),
+            )
+            return super().delete(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """Marker left by a deleted SyncedModel row so clients can drop their copy."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    change_seq = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'change_seq'])]
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.change_seq}"
 
 
 # ---------- CATEGORY ------------------------------------------------------------------
-class Category(models.Model):
+class Category(SyncedModel):
     name = models.CharField(max_length=100)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='categories', db_constraint=False)
 
     def __str__(self):
         return f"{self.name} ({self.user.username})"
 
+    def delete(self, *args, **kwargs):
+        from accounts import archive
+
+        # SET_NULL is applied by a queryset update, so stamp the affected transactions here.
+        with user_atomic(self.user_id):
+            self.transactions.update(category=None, change_seq=next_change_seq(self.user_id))
+            archive.recategorise(self.user_id, {self.pk})
+            return super().delete(*args, **kwargs)
+
 
 # ---------- TRANSACTION ---------------------------------------------------------------
-class Transaction(models.Model):
+def transaction_fingerprint(user_id, day, amount, type, description):
+    """
+    Content hash identifying a transaction regardless of id: same user, day,
+    amount in cents, type and description (case and whitespace folded).
+    """
+    cents = MoneyField().get_prep_value(amount)
+    text = ' '.join((description or '').split()).casefold()
+    return hashlib.sha256(f"{user_id}|{day}|{cents}|{type}|{text}".encode()).hexdigest()
+
+
+# Fields spend_entry() reads; instances loaded without them look up the stored row on save.
+SPEND_FIELDS = {'type', 'category_id', 'date', 'amount'}
+
+
+class Transaction(SyncedModel):
     TYPE_CHOICES = [
         ('income', 'Income'),
         ('expense', 'Expense'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions', db_constraint=False)
     category = models.ForeignKey(
         Category,
         on_delete=models.SET_NULL,
@@ -45,18 +148,140 @@ class Transaction(models.Model):
         blank=True,
         related_name='transactions'
     )
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = MoneyField()
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
     description = models.TextField(blank=True, null=True)
     date = models.DateField()
+    # Not unique: unique indexes on the partitioned table would have to include date.
+    fingerprint = models.CharField(max_length=64, default='', editable=False)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta(SyncedModel.Meta):
+        indexes = SyncedModel.Meta.indexes + [
+            models.Index(fields=['date']),
+            models.Index(fields=['user', 'fingerprint']),
+            models.Index(fields=['user', 'idempotency_key']),
+        ]
 
     def __str__(self):
         return f"{self.type.capitalize()} - {self.amount} ({self.category or 'No Category'})"
 
+    def set_fingerprint(self):
+        self.fingerprint = transaction_fingerprint(
+            self.user_id, self.date, self.amount, self.type, self.description
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Only keep the stored values; their spend entry is worked out if the row is saved or deleted.
+        if not instance.get_deferred_fields() & SPEND_FIELDS:
+            instance._saved_row = instance._spend_row()
+        return instance
+
+    def _spend_row(self):
+        return self.type, self.category_id, self.date, self.amount
+
+    @staticmethod
+    def _spend_entry(type, category_id, date, amount):
+        if type != 'expense' or category_id is None:
+            return None
+        return category_id, date.replace(day=1), MoneyField().get_prep_value(amount)
+
+    def spend_entry(self):
+        """``(category_id, month, cents)`` this row adds to CategorySpend, or None."""
+        return self._spend_entry(*self._spend_row())
+
+    def _saved(self):
+        if self._state.adding:
+            return None
+        if not hasattr(self, '_saved_row'):
+            stored = Transaction.objects.filter(pk=self.pk).only('type', 'category', 'date', 'amount').first()
+            self._saved_row = stored._saved_row if stored else None
+        return self._saved_row
+
+    def saved_spend_entry(self):
+        """spend_entry() of the row as currently stored."""
+        row = self._saved()
+        return self._spend_entry(*row) if row else None
+
+    def saved_date(self):
+        """Date of the row as currently stored, or None."""
+        row = self._saved()
+        return row[2] if row else None
+
+    def save(self, *args, **kwargs):
+        from accounts import budgets
+
+        self.set_fingerprint()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'fingerprint'}
+        with user_atomic(self.user_id):
+            saved = self.saved_spend_entry()
+            super().save(*args, **kwargs)
+            budgets.record_change(self.user_id, saved, self.spend_entry())
+        self._saved_row = self._spend_row()
+
+    def delete(self, *args, **kwargs):
+        from accounts import budgets
+
+        with user_atomic(self.user_id):
+            saved = self.saved_spend_entry()
+            deleted = super().delete(*args, **kwargs)
+            budgets.record_change(self.user_id, saved, None)
+        return deleted
+
+
+# ---------- TRANSACTION ARCHIVE -------------------------------------------------------
+class TransactionArchive(models.Model):
+    """
+    One user's transactions for one year, moved out of the Transaction table
+    by ``archive_transactions``. ``data`` is gzipped NDJSON (see accounts.archive);
+    ``monthly_totals`` maps month to [income, expenses] in cents so summaries
+    never need to decompress it.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='transaction_archives', db_constraint=False
+    )
+    year = models.IntegerField()
+    data = models.BinaryField()
+    monthly_totals = models.JSONField(default=dict)
+    row_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'year')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.year} ({self.row_count} transactions)"
+
+
+class ArchivedCategoryUsage(models.Model):
+    """
+    One category's transaction count, totals and last-used date within one
+    TransactionArchive year, rewritten with the archive so category usage can
+    include archived rows without decompressing them.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='archived_category_usage', db_constraint=False
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='archived_usage')
+    year = models.IntegerField()
+    transaction_count = models.PositiveIntegerField(default=0)
+    income_total = MoneyField(default=0)
+    expense_total = MoneyField(default=0)
+    last_used = models.DateField()
+
+    class Meta:
+        unique_together = ('category', 'year')
+
+    def __str__(self):
+        return f"{self.category_id} {self.year}: {self.transaction_count} transactions"
+
 
 # ---------- CALENDAR ------------------------------------------------------------------
 class Calendar(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calendars')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='calendars', db_constraint=False)
     month = models.IntegerField()  # 1–12
     year = models.IntegerField()
 
@@ -71,9 +296,15 @@ class Calendar(models.Model):
 class CalendarCell(models.Model):
     calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, related_name='cells')
     date = models.DateField()
-    total_income = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    total_expenses = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    net_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_income = MoneyField(default=0)
+    total_expenses = MoneyField(default=0)
+    net_balance = MoneyField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['date'])]
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'date'], name='unique_calendar_cell_date'),
+        ]
 
     def update_totals(self):
         """Recalculate income, expenses, and balance for this day."""
@@ -95,24 +326,171 @@ class CalendarCell(models.Model):
 
 
 # ---------- BILL DUE ------------------------------------------------------------------
-class BillDue(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bills')
+class BillDue(SyncedModel):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bills', db_constraint=False)
     name = models.CharField(max_length=100)
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    amount = MoneyField()
     type = models.CharField(max_length=20, choices=[('Bill', 'Bill'), ('Credit Card', 'Credit Card')])
     due_date = models.DateField() 
     note = models.TextField(blank=True, null=True)
     is_paid = models.BooleanField(default=False)
-    
+    paid_on = models.DateField(null=True, blank=True)  # set when is_paid first turns true
+
+    class Meta(SyncedModel.Meta):
+        indexes = SyncedModel.Meta.indexes + [models.Index(fields=['due_date'])]
+
+    def save(self, *args, **kwargs):
+        paid_on = (self.paid_on or timezone.localdate()) if self.is_paid else None
+        if paid_on != self.paid_on:
+            self.paid_on = paid_on
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'paid_on'}
+        super().save(*args, **kwargs)
+
+
+# ---------- BUDGET --------------------------------------------------------------------
+class Budget(models.Model):
+    """A spending limit for one category per calendar month or year."""
+    PERIOD_CHOICES = [
+        ('monthly', 'Monthly'),
+        ('yearly', 'Yearly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets', db_constraint=False)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='budgets')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='monthly')
+    limit = MoneyField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('category', 'period')
+
+    def __str__(self):
+        return f"{self.category.name} {self.period} {self.limit}"
+
+
+class CategorySpend(models.Model):
+    """
+    Running expense total of one category for one month (``month`` is the 1st),
+    kept up to date by Transaction.save()/delete() (see accounts.budgets).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_spend', db_constraint=False)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='spend')
+    month = models.DateField()
+    spent = MoneyField(default=0)
+
+    class Meta:
+        unique_together = ('category', 'month')
+
+    def __str__(self):
+        return f"{self.category_id} {self.month:%Y-%m}: {self.spent}"
+
+
+class BudgetEvent(models.Model):
+    """Recorded the first time a budget's spend reaches a threshold in a period."""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='events')
+    period_start = models.DateField()
+    threshold = models.PositiveSmallIntegerField()  # percent of the limit
+    spent = MoneyField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('budget', 'period_start', 'threshold')
+
+    def __str__(self):
+        return f"{self.budget} reached {self.threshold}% on {self.created_at:%Y-%m-%d}"
+
+
+# ---------- ANOMALY -------------------------------------------------------------------
+class SpendingAnomaly(models.Model):
+    """
+    Something unusual found by ``detect_anomalies`` (see accounts.anomalies).
+    ``object_id`` is the Transaction or BillDue the finding is about, if any;
+    ``score`` is how far outside the baseline it is (standard deviations for
+    spending, days for late bills).
+    """
+    KIND_CHOICES = [
+        ('spike', 'Category spending spike'),
+        ('large_transaction', 'Unusually large transaction'),
+        ('late_bill', 'Bill paid late'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='anomalies', db_constraint=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True, related_name='anomalies'
+    )
+    date = models.DateField()  # month start for spikes, transaction or due date otherwise
+    object_id = models.BigIntegerField(null=True, blank=True)
+    amount = MoneyField()
+    baseline = MoneyField(null=True, blank=True)
+    score = models.FloatField()
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'date'])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.user_id} on {self.date}"
+
+
+# ---------- JOB ----------------------------------------------------------------------
+class Job(models.Model):
+    """A unit of background work for one user, optionally over a date range."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='jobs')
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+            models.Index(fields=['user', 'kind', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id} ({self.status})"
+
 
 # ---------- SIGNALS ------------------------------------------------------------------
 @receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
 def update_calendar_cell(sender, instance, **kwargs):
-    """Update the daily cell totals whenever a transaction is added or updated."""
-    calendar, created = Calendar.objects.get_or_create(
-        user=instance.user,
-        month=instance.date.month,
-        year=instance.date.year
-    )
-    cell, created = CalendarCell.objects.get_or_create(calendar=calendar, date=instance.date)
-    cell.update_totals()
+    """
+    Queue a recompute of the daily cell whenever a transaction is added,
+    updated or deleted, and of the day it was on before when its date changed.
+    Runs before save() refreshes the stored-row snapshot, so saved_date() is
+    still the old date. A deleted row may have been loaded with ``date``
+    deferred, and can no longer fetch it, so its snapshot is used instead.
+    """
+    from accounts import jobs
+
+    if kwargs['signal'] is post_delete:
+        days = {instance.saved_date()} - {None}
+    else:
+        days = {instance.date}
+        if not kwargs.get('created'):
+            days.add(instance.saved_date() or instance.date)
+    for day in days:
+        jobs.enqueue('recompute_cells', instance.user_id, day, day)
+
+
+@receiver(post_save, sender=BillDue)
+@receiver(post_delete, sender=BillDue)
+def announce_bill_change(sender, instance, **kwargs):
+    """Tell the user's event streams which day's bills changed."""
+    deleted = kwargs['signal'] is post_delete
+    events.publish(instance.user_id, 'bills', [instance.due_date, instance.pk, deleted])
+
@@ -0,0 +1,35 @@
+"""
+Process pools for management commands that split work across CPUs.
+
+Kept free of model imports so spawned workers can load it before Django is set up.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
+
+
+def _setup_django():
+    import django
+
+    django.setup()
+
+
+def process_pool(workers):
+    """A spawn-based pool whose workers each run django.setup() and open their own DB connections."""
+    # Never let a child inherit a live connection from the parent.
+    connections.close_all()
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_setup_django,
+    )
+
+
+def id_ranges(first_id, last_id, size):
+    """Split [first_id, last_id] into inclusive (lo, hi) ranges of ``size`` ids."""
+    lo = first_id
+    while lo <= last_id:
+        hi = min(lo + size - 1, last_id)
+        yield lo, hi
+        lo = hi + 1
@@ -0,0 +1,89 @@
+"""
+Set-based deletion of everything a user owns.
+
+Django's cascade collector loads every related row into memory before
+deleting it, which is slow for users with years of history. ``purge_user``
+instead empties the large per-user tables with chunked ``DELETE ... WHERE id
+IN (SELECT id ... LIMIT n)`` statements, each committed on its own, and only
+then deletes the User through the ORM, leaving the collector with a handful of
+rows (profile, token, jobs, admin log entries).
+"""
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+
+from accounts.db_routers import forget_shard, shard_for_user
+
+from accounts.models import (
+    ArchivedCategoryUsage, Calendar, CalendarCell, Transaction, TransactionArchive, BillDue, Category, Tombstone,
+    Budget, BudgetEvent, CategorySpend, SpendingAnomaly,
+)
+
+
+CHUNK_SIZE = 5000
+
+
+def _steps(connection):
+    """(model, WHERE clause selecting the user's rows), children before parents."""
+    calendars = connection.ops.quote_name(Calendar._meta.db_table)
+    budgets = connection.ops.quote_name(Budget._meta.db_table)
+    return [
+        (CalendarCell, f"calendar_id IN (SELECT id FROM {calendars} WHERE user_id = %s)"),
+        (Calendar, "user_id = %s"),
+        (Transaction, "user_id = %s"),
+        (TransactionArchive, "user_id = %s"),
+        (ArchivedCategoryUsage, "user_id = %s"),
+        (BillDue, "user_id = %s"),
+        (BudgetEvent, f"budget_id IN (SELECT id FROM {budgets} WHERE user_id = %s)"),
+        (Budget, "user_id = %s"),
+        (CategorySpend, "user_id = %s"),
+        (SpendingAnomaly, "user_id = %s"),
+        (Category, "user_id = %s"),
+    ]
+
+
+def _delete_chunk(connection, model, where, user_id, chunk_size):
+    table = connection.ops.quote_name(model._meta.db_table)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN "
+            f"(SELECT id FROM {table} WHERE {where} LIMIT %s)",
+            [user_id, chunk_size],
+        )
+        return cursor.rowcount
+
+
+def _delete_all(connection, model, where, user_id, chunk_size):
+    count = 0
+    while True:
+        removed = _delete_chunk(connection, model, where, user_id, chunk_size)
+        count += removed
+        if removed < chunk_size:
+            return count
+
+
+def delete_user_rows(user_id, using=None, chunk_size=CHUNK_SIZE):
+    """
+    Empty the sharded per-user tables of ``user_id`` on ``using`` (default:
+    the user's shard); returns ``{model_name: rows_deleted}``.
+    """
+    connection = connections[using or shard_for_user(user_id)]
+    return {
+        model._meta.model_name: _delete_all(connection, model, where, user_id, chunk_size)
+        for model, where in _steps(connection)
+    }
+
+
+def purge_user(user_id, chunk_size=CHUNK_SIZE):
+    """Delete the user and all their data; returns ``{model_name: rows_deleted}``."""
+    deleted = delete_user_rows(user_id, chunk_size=chunk_size)
+    deleted['tombstone'] = _delete_all(
+        connections[router.db_for_write(Tombstone)], Tombstone, "user_id = %s", user_id, chunk_size
+    )
+
+    with transaction.atomic():
+        _, remaining = User.objects.filter(pk=user_id).delete()
+    forget_shard(user_id)
+    for label, count in remaining.items():
+        name = label.rsplit('.', 1)[-1].lower()
+        deleted[name] = deleted.get(name, 0) + count
+    return deleted
@@ -0,0 +1,194 @@
+"""
+Cross-shard operations: parallel fan-out for reports and moving a user's
+rows from one shard to another. Routing itself lives in accounts.db_routers.
+"""
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from accounts.archive import remap_categories
+from accounts.db_routers import DEFAULT_SHARD, forget_shard, shard_aliases, shard_for_user, using_shard
+from accounts.models import (
+    ArchivedCategoryUsage, Calendar, CalendarCell, Transaction, TransactionArchive, BillDue, Category,
+    Budget, BudgetEvent, CategorySpend,
+    Profile, ShardAssignment, Tombstone, next_change_seq,
+)
+from accounts.purge import delete_user_rows
+
+
+COPY_BATCH = 1000
+# Extra wait past SHARD_CACHE_SECONDS before a moved user's old rows are deleted.
+DROP_MARGIN_SECONDS = 60
+
+
+def drop_delay():
+    """Seconds after a move until no process can still route to the old shard."""
+    return settings.SHARD_CACHE_SECONDS + DROP_MARGIN_SECONDS
+
+
+# ---------- FAN-OUT -------------------------------------------------------------------
+def fan_out(func, *args, shards=None):
+    """
+    Call ``func(*args)`` once per shard, in parallel threads, with the per-user
+    models routed to that shard. Returns ``{alias: result}``.
+    """
+    aliases = shards or shard_aliases()
+
+    def run(alias):
+        try:
+            with using_shard(alias):
+                return func(*args)
+        finally:
+            connections.close_all()  # this thread's connections only
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return dict(zip(aliases, pool.map(run, aliases)))
+
+
+# ---------- MOVING USERS --------------------------------------------------------------
+def _copy(model, rows, target, **remap):
+    """
+    Insert copies of ``rows`` on ``target`` with fresh ids (ids are per shard,
+    so the old ones may be taken). ``remap`` maps FK attnames to {old: new}.
+    Returns ``{old_id: new_id}``.
+    """
+    old_ids = [row.pk for row in rows]
+    for row in rows:
+        row.pk = None
+        row._state.adding = True
+        for attname, mapping in remap.items():
+            old = getattr(row, attname)
+            setattr(row, attname, mapping.get(old) if old is not None else None)
+    model.objects.using(target).bulk_create(rows, batch_size=COPY_BATCH)
+    return dict(zip(old_ids, (row.pk for row in rows)))
+
+
+def move_user(user_id, target):
+    """
+    Move a user's per-user rows to ``target`` and repoint their ShardAssignment.
+
+    The user's ShardAssignment and Profile rows stay locked throughout. That
+    waits out in-flight writes (user_atomic share-locks the assignment) and
+    holds back new ones, which then read the new shard. Rows get new ids on
+    the target; the old ids are tombstoned and the copies stamped with a new
+    change sequence, so delta sync clients swap them over.
+
+    The source copy is left in place: other processes may have the old shard
+    cached for up to SHARD_CACHE_SECONDS and keep reading it. A
+    ``drop_moved_rows`` job deletes it once those entries have expired.
+    Returns ``{model_name: rows_moved}``.
+    """
+    if shard_for_user(user_id, fresh=True) == target:
+        return {}
+
+    moved = {}
+    # Exit order commits the copies first, then the switch.
+    with transaction.atomic(using=DEFAULT_SHARD), transaction.atomic(using=target):
+        ShardAssignment.objects.get_or_create(user_id=user_id, defaults={'shard': DEFAULT_SHARD})
+        source = ShardAssignment.objects.select_for_update().values_list('shard', flat=True).get(user_id=user_id)
+        if source == target:
+            return {}
+        Profile.objects.select_for_update().filter(user_id=user_id).first()
+        seq = next_change_seq(user_id)
+
+        def copy_synced(model, **remap):
+            ids, batch = {}, []
+            rows = model.objects.using(source).filter(user_id=user_id).order_by('pk')
+            for row in rows.iterator(chunk_size=COPY_BATCH):
+                row.change_seq = seq
+                batch.append(row)
+                if len(batch) == COPY_BATCH:
+                    ids.update(_copy(model, batch, target, **remap))
+                    batch = []
+            ids.update(_copy(model, batch, target, **remap))
+            Tombstone.objects.using(DEFAULT_SHARD).bulk_create(
+                [
+                    Tombstone(user_id=user_id, model=model._meta.model_name, object_id=old, change_seq=seq)
+                    for old in ids
+                ],
+                batch_size=COPY_BATCH,
+            )
+            moved[model._meta.model_name] = len(ids)
+            return ids
+
+        categories = copy_synced(Category)
+        copy_synced(Transaction, category_id=categories)
+        copy_synced(BillDue)
+
+        calendars = _copy(Calendar, list(Calendar.objects.using(source).filter(user_id=user_id)), target)
+        cells = _copy(
+            CalendarCell,
+            list(CalendarCell.objects.using(source).filter(calendar_id__in=list(calendars))),
+            target,
+            calendar_id=calendars,
+        )
+        # Archived records name their category by id, and the ids change here.
+        archive_rows = list(TransactionArchive.objects.using(source).filter(user_id=user_id))
+        for row in archive_rows:
+            remap_categories(row, categories)
+        archives = _copy(TransactionArchive, archive_rows, target)
+        archived_usage = _copy(
+            ArchivedCategoryUsage, list(ArchivedCategoryUsage.objects.using(source).filter(user_id=user_id)), target,
+            category_id=categories,
+        )
+        budgets = _copy(
+            Budget, list(Budget.objects.using(source).filter(user_id=user_id)), target, category_id=categories
+        )
+        budget_events = _copy(
+            BudgetEvent, list(BudgetEvent.objects.using(source).filter(budget_id__in=list(budgets))), target,
+            budget_id=budgets,
+        )
+        spend = _copy(
+            CategorySpend, list(CategorySpend.objects.using(source).filter(user_id=user_id)), target,
+            category_id=categories,
+        )
+        moved.update(
+            calendar=len(calendars), calendarcell=len(cells), transactionarchive=len(archives),
+            archivedcategoryusage=len(archived_usage), budget=len(budgets), budgetevent=len(budget_events), categoryspend=len(spend),
+        )
+
+        ShardAssignment.objects.using(DEFAULT_SHARD).update_or_create(
+            user_id=user_id, defaults={'shard': target, 'moved_at': timezone.now()}
+        )
+        transaction.on_commit(lambda: forget_shard(user_id), using=DEFAULT_SHARD)
+
+    # Drop the source copy once no process can still be routing there, and
+    # rebuild the target's cells from the copied transactions.
+    from accounts import jobs
+
+    jobs.enqueue('drop_moved_rows', user_id, delay=drop_delay())
+    span = Transaction.objects.using(target).filter(user_id=user_id).aggregate(start=Min('date'), end=Max('date'))
+    if span['start'] is not None:
+        jobs.enqueue('recompute_cells', user_id, span['start'], span['end'])
+    return moved
+
+
+def drop_moved_rows(user_id):
+    """
+    Delete the copies move_user left on shards that no longer hold the user,
+    once the latest move is drop_delay() old; a move made after the drop was
+    queued therefore pushes it back. The ShardAssignment stays locked
+    meanwhile, so no move can start and make the copy being kept stale.
+    Returns the seconds still to wait, 0 once dropped.
+    """
+    with transaction.atomic(using=DEFAULT_SHARD):
+        assignment = (
+            ShardAssignment.objects.select_for_update()
+            .filter(user_id=user_id).values_list('shard', 'moved_at').first()
+        )
+        if assignment is None:
+            return 0
+        current, moved_at = assignment
+        if moved_at is not None:
+            wait = (moved_at + timedelta(seconds=drop_delay()) - timezone.now()).total_seconds()
+            if wait > 0:
+                return math.ceil(wait)
+        for alias in shard_aliases():
+            if alias != current:
+                delete_user_rows(user_id, using=alias)
+    return 0
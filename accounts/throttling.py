@@ -0,0 +1,120 @@
+"""
+Cost-based request throttling.
+
+Every caller (user id, or client IP when anonymous) has a token bucket of
+THROTTLE_CAPACITY units that refills at THROTTLE_REFILL_RATE units a second.
+A request costs THROTTLE_COSTS[url name] units (1 when not listed), so a
+dashboard summary that aggregates a year of rows drains the bucket much faster
+than a detail GET. A request the bucket cannot pay for is refused with 429 and
+a Retry-After of the seconds until it could be. A THROTTLE_REFILL_RATE of 0
+never refills: each caller gets THROTTLE_CAPACITY units in all, and refusals
+carry no Retry-After.
+
+Buckets live in this process unless THROTTLE_CACHE names a cache alias, in
+which case every worker shares them through that cache. The shared bucket is
+read and written without a lock, so concurrent requests can occasionally be
+undercharged, the same trade DRF's own rate throttles make.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+class LocalBuckets:
+    """``{key: (tokens, updated_at)}`` for one process."""
+    MAX_KEYS = 10_000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, rate, now):
+        with self._lock:
+            if len(self._buckets) >= self.MAX_KEYS:
+                self._prune(capacity, rate, now)
+            tokens, wait = _take(self._buckets.get(key), cost, capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            return wait
+
+    def _prune(self, capacity, rate, now):
+        """Forget buckets that have refilled completely; they read back as full anyway."""
+        if not rate:
+            return  # nothing refills, so every bucket must be kept
+        full = capacity / rate
+        self._buckets = {key: value for key, value in self._buckets.items() if now - value[1] < full}
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBuckets:
+    """Buckets shared between workers through a Django cache."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def take(self, key, cost, capacity, rate, now):
+        cache = caches[self.alias]
+        key = f"throttle:{key}"
+        tokens, wait = _take(cache.get(key), cost, capacity, rate, now)
+        # An untouched bucket is full again after capacity / rate seconds; without refill, never.
+        cache.set(key, (tokens, now), timeout=int(capacity / rate) + 1 if rate else None)
+        return wait
+
+
+def _take(bucket, cost, capacity, rate, now):
+    """New token count for ``bucket`` after charging ``cost``, and seconds to wait (0 when paid)."""
+    if bucket is None:
+        tokens = capacity
+    else:
+        tokens, updated_at = bucket
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+    cost = min(cost, capacity)  # a request dearer than the whole bucket waits for a full one
+    if tokens >= cost:
+        return tokens - cost, 0
+    return tokens, (cost - tokens) / rate if rate else math.inf
+
+
+_local = LocalBuckets()
+
+
+def buckets():
+    alias = settings.THROTTLE_CACHE
+    return CacheBuckets(alias) if alias else _local
+
+
+class CostBasedThrottle(BaseThrottle):
+    """Charges each request its view's cost against the caller's token bucket."""
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_cost(self, request, view):
+        match = request.resolver_match
+        return settings.THROTTLE_COSTS.get(match.url_name if match else None, 1)
+
+    def get_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_CAPACITY:
+            return True
+        self.wait_seconds = buckets().take(
+            self.get_key(request),
+            self.get_cost(request, view),
+            settings.THROTTLE_CAPACITY,
+            settings.THROTTLE_REFILL_RATE,
+            time.time(),
+        )
+        return not self.wait_seconds
+
+    def wait(self):
+        # An infinite wait has no Retry-After to give.
+        return None if self.wait_seconds == math.inf else self.wait_seconds
@@ -0,0 +1,170 @@
+"""
+Monthly trends: income, expenses and net per month with 3- and 12-month
+moving averages, cumulative net over the requested range and year-over-year
+change.
+
+On PostgreSQL ``monthly_trends`` is one query: generate_series supplies
+every month (empty ones count as zero), archived months are unpacked from
+TransactionArchive.monthly_totals with jsonb_each, and AVG/SUM/LAG window
+functions do the rest. Other backends build the same rows in Python from one
+grouped query plus the archive rollups. Either way the work is O(months).
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connections, router
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+
+from accounts.archive import archived_monthly_totals
+from accounts.fields import CENTS, in_cents
+from accounts.models import Transaction, TransactionArchive
+
+
+SERIES = ('income', 'expenses', 'net')
+WINDOWS = (3, 12)
+
+
+def _money(cents):
+    return (Decimal(cents) / 100).quantize(CENTS) if cents is not None else None
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _row(month, values, averages, cumulative, last_year):
+    """One output row from cent amounts; shared by both paths so their output matches."""
+    row = {'month': month}
+    for name in SERIES:
+        row[name] = _money(values[name])
+    for window in WINDOWS:
+        for name in SERIES:
+            row[f'{name}_avg_{window}'] = _money(averages[(name, window)])
+    row['cumulative_net'] = _money(cumulative)
+    for name in SERIES:
+        previous = last_year.get(name)
+        change = values[name] - previous if previous is not None else None
+        row[f'{name}_yoy'] = _money(change)
+        row[f'{name}_yoy_pct'] = (
+            float(round(change * 100 / abs(previous), 1)) if change is not None and previous else None
+        )
+    return row
+
+
+# ---------- POSTGRESQL ----------------------------------------------------------------
+TRENDS_SQL = """
+WITH months AS (
+    SELECT generate_series(%(first)s::date, %(last)s::date, interval '1 month')::date AS month
+),
+totals AS (
+    SELECT date_trunc('month', "date")::date AS month,
+           SUM(amount) FILTER (WHERE type = 'income') AS income,
+           SUM(amount) FILTER (WHERE type = 'expense') AS expenses
+    FROM {transactions}
+    WHERE user_id = %(user_id)s AND "date" >= %(first)s AND "date" < %(after)s
+    GROUP BY 1
+    UNION ALL
+    SELECT make_date(archive.year, rollup.key::int, 1),
+           (rollup.value->>0)::bigint,
+           (rollup.value->>1)::bigint
+    FROM {archives} archive, jsonb_each(archive.monthly_totals) rollup
+    WHERE archive.user_id = %(user_id)s AND archive.year BETWEEN %(first_year)s AND %(last_year)s
+),
+series AS (
+    SELECT months.month,
+           COALESCE(SUM(totals.income), 0) AS income,
+           COALESCE(SUM(totals.expenses), 0) AS expenses,
+           COALESCE(SUM(totals.income), 0) - COALESCE(SUM(totals.expenses), 0) AS net
+    FROM months LEFT JOIN totals ON totals.month = months.month
+    GROUP BY months.month
+),
+windowed AS (
+    SELECT month, income, expenses, net,
+           AVG(income) OVER w3, AVG(expenses) OVER w3, AVG(net) OVER w3,
+           AVG(income) OVER w12, AVG(expenses) OVER w12, AVG(net) OVER w12,
+           LAG(income, 12) OVER by_month, LAG(expenses, 12) OVER by_month, LAG(net, 12) OVER by_month
+    FROM series
+    WINDOW by_month AS (ORDER BY month),
+           w3 AS (ORDER BY month ROWS BETWEEN 2 PRECEDING AND CURRENT ROW),
+           w12 AS (ORDER BY month ROWS BETWEEN 11 PRECEDING AND CURRENT ROW)
+)
+SELECT windowed.*, SUM(net) OVER (ORDER BY month ROWS UNBOUNDED PRECEDING)
+FROM windowed
+WHERE month >= %(start)s
+ORDER BY month
+"""
+
+
+def _postgres_trends(connection, user_id, start, end):
+    first = _add_months(start, -12)  # history for the 12-month window and LAG(12)
+    sql = TRENDS_SQL.format(
+        transactions=connection.ops.quote_name(Transaction._meta.db_table),
+        archives=connection.ops.quote_name(TransactionArchive._meta.db_table),
+    )
+    params = {
+        'user_id': user_id, 'first': first, 'last': end, 'after': _add_months(end, 1),
+        'first_year': first.year, 'last_year': end.year, 'start': start,
+    }
+    rows = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for month, income, expenses, net, *rest in cursor.fetchall():
+            averages = dict(zip([(name, w) for w in WINDOWS for name in SERIES], rest[:6]))
+            last_year = {name: value for name, value in zip(SERIES, rest[6:9]) if value is not None}
+            values = {'income': income, 'expenses': expenses, 'net': net}
+            rows.append(_row(month, values, averages, rest[9], last_year))
+    return rows
+
+
+# ---------- PYTHON FALLBACK -----------------------------------------------------------
+def _monthly_cents(user_id, first, end):
+    """``{month: {'income': cents, 'expenses': cents}}`` for live and archived rows."""
+    totals = defaultdict(lambda: {'income': 0, 'expenses': 0})
+    rows = (
+        Transaction.objects
+        .filter(user_id=user_id, date__gte=first, date__lt=_add_months(end, 1))
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(
+            income=in_cents(Sum('amount', filter=Q(type='income'))),
+            expenses=in_cents(Sum('amount', filter=Q(type='expense'))),
+        )
+    )
+    for row in rows:
+        totals[row['month']]['income'] += row['income'] or 0
+        totals[row['month']]['expenses'] += row['expenses'] or 0
+    for (year, month), (income, expenses) in archived_monthly_totals(user_id).items():
+        if first <= date(year, month, 1) <= end:
+            totals[date(year, month, 1)]['income'] += income
+            totals[date(year, month, 1)]['expenses'] += expenses
+    return totals
+
+
+def _python_trends(user_id, start, end):
+    first = _add_months(start, -12)
+    totals = _monthly_cents(user_id, first, end)
+    series, rows, cumulative = [], [], 0
+    month = first
+    while month <= end:
+        income, expenses = totals[month]['income'], totals[month]['expenses']
+        series.append({'income': income, 'expenses': expenses, 'net': income - expenses})
+        if month >= start:
+            averages = {
+                (name, window): Decimal(sum(v[name] for v in series[-window:])) / window
+                for window in WINDOWS for name in SERIES
+            }
+            cumulative += series[-1]['net']
+            rows.append(_row(month, series[-1], averages, cumulative, series[-13]))
+        month = _add_months(month, 1)
+    return rows
+
+
+def monthly_trends(user_id, start, end):
+    """Trend rows for each month from ``start`` to ``end`` (first days of months), oldest first."""
+    connection = connections[router.db_for_read(Transaction)]
+    if connection.vendor == 'postgresql':
+        return _postgres_trends(connection, user_id, start, end)
+    return _python_trends(user_id, start, end)
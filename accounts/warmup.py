@@ -0,0 +1,109 @@
+"""
+Work that would otherwise land on the first requests after a dyno restart.
+
+``warm_up`` is called from backend.wsgi and backend.asgi once the application
+is loaded. With ``gunicorn --preload`` (see Procfile) that happens once in the
+master, so every forked worker starts warm. Each step returns quickly once
+done, so calling it again is harmless.
+
+Database connections are not warmed: one opened in the master cannot be
+shared with forked workers, and under ASGI Django closes connections after
+every request anyway (CONN_MAX_AGE must stay 0 there), so there is nothing
+for a worker to keep.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.urls import URLPattern, URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _patterns(resolver):
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _patterns(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def _api_views():
+    """DRF view classes behind the URLconf."""
+    views = []
+    for pattern in _patterns(get_resolver()):
+        cls = getattr(pattern.callback, "cls", None)
+        if cls is not None and cls not in views and hasattr(cls, "get_renderers"):
+            views.append(cls)
+    return views
+
+
+# ---------- STEPS ---------------------------------------------------------------------
+def warm_urls():
+    """Build the resolver's reverse and lookup tables."""
+    resolver = get_resolver()
+    resolver.reverse_dict  # noqa: B018  (populates the resolver)
+    return len(list(_patterns(resolver)))
+
+
+def warm_views():
+    """Load each API view's renderer, parser, authentication and permission classes."""
+    views = _api_views()
+    for cls in views:
+        view = cls()
+        view.get_renderers()
+        view.get_parsers()
+        view.get_authenticators()
+        view.get_permissions()
+    return len(views)
+
+
+def warm_serializers():
+    """Build every API serializer's fields, which introspects the models behind them."""
+    built = set()
+    for cls in _api_views():
+        serializer_class = getattr(cls, "serializer_class", None)
+        if serializer_class is None or serializer_class in built:
+            continue
+        serializer_class(context={}).fields  # noqa: B018
+        built.add(serializer_class)
+    return len(built)
+
+
+def warm_templates():
+    """Compile the browsable API's templates when that renderer is enabled."""
+    renderers = settings.REST_FRAMEWORK.get("DEFAULT_RENDERER_CLASSES", ())
+    if "rest_framework.renderers.BrowsableAPIRenderer" not in renderers:
+        return 0
+    names = ["rest_framework/api.html", "rest_framework/vertical/form.html"]
+    for name in names:
+        try:
+            get_template(name)
+        except TemplateDoesNotExist:
+            pass
+    return len(names)
+
+
+STEPS = [
+    ("urls", warm_urls),
+    ("views", warm_views),
+    ("serializers", warm_serializers),
+    ("templates", warm_templates),
+]
+
+
+def warm_up():
+    """Run every step; returns ``[(step, count, seconds), ...]``."""
+    timings = []
+    for name, step in STEPS:
+        started = time.perf_counter()
+        count = step()
+        timings.append((name, count, time.perf_counter() - started))
+    logger.info(
+        "Warm-up done in %.0f ms (%s)",
+        sum(seconds for _, _, seconds in timings) * 1000,
+        ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, _, seconds in timings),
+    )
+    return timings
@@ -3,6 +3,11 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests to EVENTS_PATH are answered by the server-sent events stream in
+accounts.events without going through Django's request cycle; everything else
+is handled by Django. accounts.warmup runs at import unless WARM_UP_ON_START is
+off. Serve with an ASGI server, e.g. ``uvicorn backend.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402  (import once Django is set up)
+from accounts.events import sse_app  # noqa: E402
+
+if settings.WARM_UP_ON_START:
+    from accounts.warmup import warm_up
+
+    warm_up()
+
+EVENTS_PATH = '/api/events/'
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await sse_app(scope, receive, send)
+    return await django_application(scope, receive, send)
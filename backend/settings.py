@@ -36,6 +36,36 @@ else:
         }
     }
 
+# Optional read replica. Summary and listing GETs are routed here by
+# accounts.middleware.ReplicaRoutingMiddleware; everything else uses 'default'.
+# Locally, point DATABASE_URL and DATABASE_REPLICA_URL at two SQLite files.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Optional user shards, comma-separated. Each URL becomes alias shard1, shard2, ...
+# and must be migrated with `migrate --database shardN`. Users are placed by
+# accounts.models.ShardAssignment; users without one stay on 'default'.
+DATABASE_SHARD_URLS = [url for url in os.environ.get('DATABASE_SHARD_URLS', '').split(',') if url]
+DATABASE_SHARDS = []
+
+for number, url in enumerate(DATABASE_SHARD_URLS, start=1):
+    DATABASES[f'shard{number}'] = dj_database_url.parse(url)
+    DATABASE_SHARDS.append(f'shard{number}')
+
+# Seconds a process may keep a user's shard cached. After move_user_shard the
+# old copy of the user's rows is kept this long (plus a margin) before deletion,
+# so processes still routing reads there find it.
+SHARD_CACHE_SECONDS = int(os.environ.get('SHARD_CACHE_SECONDS', 60))
+
+DATABASE_ROUTERS = ['accounts.db_routers.ShardRouter', 'accounts.db_routers.PrimaryReplicaRouter']
+
+# Seconds a user stays pinned to the primary after a write (read-your-writes).
+# Pins live in the default cache, so use a shared CACHES backend with several workers.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
 # ------------------------
 # Security Settings
 # ------------------------
@@ -75,6 +105,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'accounts.middleware.ReplicaRoutingMiddleware',
+    'accounts.middleware.ShardRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -136,12 +168,83 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    # The browsable API is a development aid; in production it only adds template
+    # loading to the first request of every worker.
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'accounts.throttling.CostBasedThrottle',
     ],
 }
 
+# Cost-based throttling (accounts.throttling): each caller's bucket holds
+# THROTTLE_CAPACITY units and refills THROTTLE_REFILL_RATE units a second.
+# Requests cost THROTTLE_COSTS[url name], or 1. THROTTLE_CAPACITY=0 disables it;
+# THROTTLE_REFILL_RATE=0 never refills, so each caller gets THROTTLE_CAPACITY in all.
+# Set THROTTLE_CACHE to a shared cache alias to share buckets between workers.
+THROTTLE_CAPACITY = int(os.environ.get("THROTTLE_CAPACITY", 120))
+THROTTLE_REFILL_RATE = float(os.environ.get("THROTTLE_REFILL_RATE", 2))
+THROTTLE_CACHE = os.environ.get("THROTTLE_CACHE") or None
+THROTTLE_COSTS = {
+    "monthly-pie-data": 10,
+    "annual-summary": 10,
+    "trends": 5,
+    "calendar-list-create": 5,
+    "calendar-range": 5,
+    "monthly-summary": 3,
+    "sync": 3,
+    "total-expenses": 2,
+    "category-list-create": 2,
+    "category-merge": 5,
+    "category-bulk-delete": 5,
+    # Password hashing is deliberately slow.
+    "signin": 5,
+    "signup": 5,
+}
+
+# backend.wsgi / backend.asgi call accounts.warmup.warm_up() at startup so
+# URL, view, serializer and template setup is not paid by the first requests.
+WARM_UP_ON_START = os.environ.get("WARM_UP_ON_START", "True").lower() == "true"
+
+# ------------------------
+# Background Jobs
+# ------------------------
+# Run with `python manage.py run_jobs`. JOBS_EAGER runs each job right after the
+# enqueuing transaction commits instead (handy for local dev without a worker).
+JOBS_EAGER = os.environ.get("JOBS_EAGER", "False").lower() == "true"
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 30      # seconds, doubled on every retry
+JOBS_LOCK_TIMEOUT = 600    # seconds before a running job is considered abandoned
+
+# ------------------------
+# Transaction Archive
+# ------------------------
+# `python manage.py archive_transactions` moves whole years older than this many
+# years before the current one into per-user compressed archives.
+TRANSACTION_ARCHIVE_AFTER_YEARS = int(os.environ.get("TRANSACTION_ARCHIVE_AFTER_YEARS", 2))
+
+# ------------------------
+# Budgets
+# ------------------------
+# Percentages of a budget's limit that record a BudgetEvent (and send a
+# ``budget`` event to the user's streams) the first time spend reaches them.
+BUDGET_ALERT_THRESHOLDS = [50, 80, 100]
+
+# ------------------------
+# Server-Sent Events
+# ------------------------
+# Streams are served by backend.asgi (gunicorn with uvicorn workers, see Procfile).
+# InProcessBackend only reaches streams in the publishing process, so it is only
+# the default with JOBS_EAGER; otherwise the job worker publishes and events are
+# relayed through PostgreSQL LISTEN/NOTIFY.
+EVENTS_BACKEND = os.environ.get("EVENTS_BACKEND") or (
+    "accounts.events.PostgresNotifyBackend"
+    if not JOBS_EAGER and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'
+    else "accounts.events.InProcessBackend"
+)
+
 # ------------------------
 # CORS Settings
 # ------------------------
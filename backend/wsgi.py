@@ -2,6 +2,8 @@
 WSGI config for backend project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+Unless WARM_UP_ON_START is off, accounts.warmup runs before the first request;
+with ``gunicorn --preload`` it runs once in the master and workers fork warm.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
@@ -14,3 +16,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402  (import once Django is set up)
+
+if settings.WARM_UP_ON_START:
+    from accounts.warmup import warm_up
+
+    warm_up()